@@ -0,0 +1,225 @@
+# Benchmarks the update_and_render pipeline itself on synthetic data.
+#
+# Benchmarks Game shaped pages are generated into a temporary directory and served by a
+# local http server, then every stage of the pipeline runs against it and its wall time
+# and peak memory are reported. Peak memory is given twice: the Python heap as traced by
+# tracemalloc, and the growth of the process RSS over the stage, which also covers native
+# allocations such as lxml's libxml2 trees.
+#
+#   python benchmarks/pipeline_benchmark.py --languages 1000 --tests 500
+#   python benchmarks/pipeline_benchmark.py --output bench.json
+#   python benchmarks/pipeline_benchmark.py --baseline bench.json --tolerance 0.25
+#
+# tracemalloc slows the Python heavy stages down, only compare runs with the same --no-trace.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import ctypes
+import ctypes.util
+import psutil
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import List, Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import update_and_render as pipeline
+
+local_executors = (pipeline.calibration_control, 'Pypy', 'Pyston')
+
+def language_names(languages: int) -> List[str]:
+    # The index page is recognised by containing both 'Python' and 'Java'
+    return ['Python', 'Java'] + [f'Lang{i:05d}' for i in range(2, languages)]
+
+def row_label(language: str) -> str:
+    return 'Python 3' if language == 'Python' else language
+
+def generate_language_page(language: str, tests: int, rng: random.Random) -> str:
+    rows = []
+    for t in range(tests):
+        if rng.random() < 0.05:
+            # some languages don't pass every test
+            continue
+        rows.append(
+            '<tbody>'
+            f'<tr><th colspan="4"><a href="#"><span>test-{t:04d}</span></a></th></tr>'
+            f'<tr><td><a href="#">{row_label(language)} #{rng.randint(1, 9)}</a></td>'
+            f'<td>{rng.randint(1000, 2000000):,}</td><td>{rng.randint(300, 4000):,}</td>'
+            f'<td>{rng.uniform(0.5, 600):.2f}</td></tr>'
+            '<tr><td><a href="#">Reference #1</a></td><td>1,000</td><td>500</td><td>1.00</td></tr>'
+            '</tbody>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>synthetic</title></head><body>'
+        '<table><tbody><tr><th>source</th><th>mem</th><th>gz</th><th>secs</th></tr></tbody>'
+        f'{"".join(rows)}</table></body></html>'
+    )
+
+def generate_site(directory: str, languages: int, tests: int, seed: int = 0):
+    names = language_names(languages)
+    links = ''.join(f'<li><a href="./{name}.html">{name}</a></li>' for name in names)
+    with open(os.path.join(directory, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html><body><ul>{links}</ul></body></html>')
+    for i, name in enumerate(names):
+        with open(os.path.join(directory, f'{name}.html'), 'w', encoding='utf-8') as f:
+            f.write(generate_language_page(name, tests, random.Random(seed * 100003 + i)))
+
+def generate_local_results(tests: int, seed: int = 0) -> List[List[Dict]]:
+    # Stand-in for get_local_extended_results, the ranking needs the locally measured executors
+    rng = random.Random(seed)
+    return [
+        [
+            {"test_name": f"test-{t:04d}", "language": label, "secs": round(rng.uniform(0.5, 600), 2),
+             "mem": rng.randint(1000, 2000000), "gz": 0, "busy": 0, "cpu load": 0}
+            for t in range(tests)
+        ]
+        for label in local_executors
+    ]
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_directory(directory: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def import_heavy_modules():
+    # update_and_render imports these lazily, load them up front so that the first stage
+    # using one is not timed importing it
+    import numpy, pandas, requests, bs4, lxml.etree, concurrent.futures
+
+def release_free_memory():
+    # glibc keeps memory freed by earlier stages (and warm-up calls) resident and hands it out
+    # again, which would hide it from the RSS growth of the next stage
+    libc = ctypes.util.find_library('c')
+    if libc and hasattr(ctypes.CDLL(libc), 'malloc_trim'):
+        ctypes.CDLL(libc).malloc_trim(0)
+
+class RssPeakSampler(threading.Thread):
+    # Polls the RSS of this process, peaks shorter than the interval are not seen
+
+    def __init__(self, interval: float = 0.001):
+        super().__init__(daemon=True)
+        self.process = psutil.Process()
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.start_rss = self.peak_rss = self.process.memory_info().rss
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def stop(self) -> int:
+        self.stopped.set()
+        self.join()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        return self.peak_rss - self.start_rss
+
+def measure(name: str, func, trace: bool, report: List[Dict], warmup: bool = False):
+    # warmup runs func once untimed first, for in-memory stages whose first call also pays for
+    # lazily loaded submodules and parser setup
+    if warmup:
+        func()
+    if trace:
+        release_free_memory()
+        sampler = RssPeakSampler()
+        sampler.start()
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    heap_mib = rss_mib = None
+    if trace:
+        heap_mib = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+        rss_mib = round(sampler.stop() / 2 ** 20, 2)
+    report.append({'stage': name, 'secs': round(elapsed, 4), 'heap_mib': heap_mib, 'rss_mib': rss_mib})
+    return result
+
+def run(languages: int, tests: int, concurrency: int, trace: bool, seed: int = 0) -> List[Dict]:
+    report = []
+    import_heavy_modules()
+    with tempfile.TemporaryDirectory() as site_dir, tempfile.TemporaryDirectory() as cache_dir:
+        generate_site(site_dir, languages, tests, seed)
+        pipeline.http_cache_dir = cache_dir
+        server = serve_directory(site_dir)
+        uri = f'http://127.0.0.1:{server.server_address[1]}/'
+        try:
+            with open(os.path.join(site_dir, 'Python.html'), 'r', encoding='utf-8') as f:
+                page = f.read()
+            for parser_name, parse_page in pipeline.page_parser_map.items():
+                measure(f'parse page ({parser_name})', lambda: parse_page(page, 'Python'), trace, report, warmup=True)
+
+            full_language_result_list = measure(
+                'get_test_results_from_website',
+                lambda: pipeline.get_test_results_from_website(concurrency=concurrency, uri=uri),
+                trace, report
+            )
+            measure(
+                'get_test_results_from_website (revalidate)',
+                lambda: pipeline.get_test_results_from_website(concurrency=concurrency, uri=uri),
+                trace, report
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    local_results = generate_local_results(tests, seed)
+    local_labels = pipeline.local_executor_labels(local_results)
+    full_language_result_list.extend(local_results)
+    frames = measure('convert_into_pandas_dataframes',
+        lambda: pipeline.convert_into_pandas_dataframes(full_language_result_list, ("secs", "mem")), trace, report, warmup=True)
+    frame_secs, frame_mem = frames["secs"], frames["mem"]
+    result_secs = measure('compute_language_ordered_value (secs)',
+        lambda: pipeline.compute_language_ordered_value(frame_secs, 2, local_labels), trace, report, warmup=True)
+    result_mem = measure('compute_language_ordered_value (mem)',
+        lambda: pipeline.compute_language_ordered_value(frame_mem, 3, local_labels), trace, report, warmup=True)
+    measure('add_weighted_index', lambda: pipeline.add_weighted_index(result_secs, result_mem), trace, report, warmup=True)
+    return report
+
+def compare(report: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    # Stages that got slower than the baseline by more than `tolerance`, ignoring sub-10ms noise
+    baseline = {x['stage']: x for x in baseline}
+    regressions = []
+    for item in report:
+        previous = baseline.get(item['stage'])
+        if previous and item['secs'] > max(previous['secs'] * (1 + tolerance), previous['secs'] + 0.01):
+            regressions.append(f"{item['stage']}: {previous['secs']}s -> {item['secs']}s")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--languages', type=int, default=100)
+    parser.add_argument('--tests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=pipeline.fetch_concurrency)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-trace', action='store_true', help="skip tracemalloc and the RSS sampler, timings only")
+    parser.add_argument('--output', help="write the report as json")
+    parser.add_argument('--baseline', help="json report of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = run(args.languages, args.tests, args.concurrency, not args.no_trace, args.seed)
+    print(f"{args.languages} languages x {args.tests} tests")
+    print(f"{'stage':<48}{'time':>12}" + ('' if args.no_trace else f"{'py heap':>14}{'rss growth':>14}"))
+    for item in report:
+        peak = '' if item['heap_mib'] is None else f"{item['heap_mib']:>10.2f} MiB{item['rss_mib']:>10.2f} MiB"
+        print(f"{item['stage']:<48}{item['secs']:>10.3f} s{peak}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.loads(f.read()), args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}")
+        sys.exit(1 if regressions else 0)
@@ -1,216 +1,237 @@
-const raw_data = JSON.parse('[["C clang", 1.0, 1.0], ["C++ g++", 1.12, 2.0], ["Rust", 1.17, 3.0], ["Julia", 2.32, 5.0], ["C# .NET", 2.39, 7.0], ["Chapel", 2.52, 4.0], ["Classic Fortran", 2.55, 8.0], ["Ada 2012 GNAT", 2.89, 6.0], ["F# .NET", 3.23, 9.0], ["Go", 3.35, 10.0], ["Haskell GHC", 3.45, 11.0], ["Free Pascal", 3.63, 12.0], ["Java", 3.69, 15.0], ["OCaml", 3.94, 13.0], ["Swift", 5.5, 14.0], ["Lisp SBCL", 5.55, 16.0], ["Dart", 6.37, 18.0], ["Node js", 6.63, 17.0], ["Racket", 7.56, 19.0], ["PHP", 12.74, 20.0], ["Pypy", 17.41, 23.0], ["Pyston", 28.6, 22.0], ["Erlang", 33.66, 24.0], ["Ruby", 39.01, 26.0], ["VW Smalltalk", 41.11, 21.0], ["Python 3", 55.1, 25.0], ["Lua", 61.34, 28.0], ["Perl", 67.97, 27.0]]')
-const render_date = '2023-02-01'
-const container = document.getElementById('main')
-container.style.width="1080px"
-container.style.height= raw_data.length * 48 + "px"
-const container2 = document.getElementById('main2')
-container2.style.width="1080px"
-container2.style.height= raw_data.length * 48 + "px"
-const myChart = echarts.init(container);
-const myChart2 = echarts.init(container2);
-const colors = ['#454C6F', '#D1DDE2', '#7A97A3', '#A89882', '#484E2A', '#EDF0F4', '#C2B7A7']
+// The ranking is either inlined below or, when rendered with --data-file, kept in a separate
+// json file fetched after the page has loaded
+const data_url = ''
+const loadData = () => data_url === '' ?
+  Promise.resolve({raw_data: JSON.parse('[["C clang", 1.0, 1.0], ["C++ g++", 1.12, 2.0], ["Rust", 1.17, 3.0], ["Julia", 2.32, 5.0], ["C# .NET", 2.39, 7.0], ["Chapel", 2.52, 4.0], ["Classic Fortran", 2.55, 8.0], ["Ada 2012 GNAT", 2.89, 6.0], ["F# .NET", 3.23, 9.0], ["Go", 3.35, 10.0], ["Haskell GHC", 3.45, 11.0], ["Free Pascal", 3.63, 12.0], ["Java", 3.69, 15.0], ["OCaml", 3.94, 13.0], ["Swift", 5.5, 14.0], ["Lisp SBCL", 5.55, 16.0], ["Dart", 6.37, 18.0], ["Node js", 6.63, 17.0], ["Racket", 7.56, 19.0], ["PHP", 12.74, 20.0], ["Pypy", 17.41, 23.0], ["Pyston", 28.6, 22.0], ["Erlang", 33.66, 24.0], ["Ruby", 39.01, 26.0], ["VW Smalltalk", 41.11, 21.0], ["Python 3", 55.1, 25.0], ["Lua", 61.34, 28.0], ["Perl", 67.97, 27.0]]'), render_date: '2023-02-01'}) :
+  new Promise((resolve, reject) => {
+    // XMLHttpRequest rather than fetch, which refuses file:// urls
+    const request = new XMLHttpRequest()
+    request.open('GET', data_url)
+    request.responseType = 'json'
+    request.onload = () => request.response ? resolve(request.response) : reject(new Error(`Failed to load ${data_url}`))
+    request.onerror = () => reject(new Error(`Failed to load ${data_url}`))
+    request.send()
+  })
 
-let option = {
-  title: [
-    {
-      text: 'The Computer Language Benchmarks Game Visualization',
-      link: "https://benchmarksgame-team.pages.debian.net/benchmarksgame/index.html",
-      textStyle: {
-        fontStyle: "normal",
-        fontFamily: "Arial",
-        fontSize: 23,
+const draw = (raw_data, render_date) => {
+  const container = document.getElementById('main')
+  container.style.width="1080px"
+  container.style.height= raw_data.length * 48 + "px"
+  const container2 = document.getElementById('main2')
+  container2.style.width="1080px"
+  container2.style.height= raw_data.length * 48 + "px"
+  const myChart = echarts.init(container);
+  const myChart2 = echarts.init(container2);
+  // Resolves once both charts have rendered, the screenshot step waits on it instead of sleeping
+  const whenFinished = chart => new Promise(resolve => chart.on('finished', resolve))
+  const ready = Promise.all([whenFinished(myChart), whenFinished(myChart2)])
+  const colors = ['#454C6F', '#D1DDE2', '#7A97A3', '#A89882', '#484E2A', '#EDF0F4', '#C2B7A7']
+
+  let option = {
+    title: [
+      {
+        text: 'The Computer Language Benchmarks Game Visualization',
+        link: "https://benchmarksgame-team.pages.debian.net/benchmarksgame/index.html",
+        textStyle: {
+          fontStyle: "normal",
+          fontFamily: "Arial",
+          fontSize: 23,
+        },
+        top: "4px",
+        left: '50%',
+        textAlign: "center",
+        subtextStyle: {
+          color: colors[0]
+        }
       },
-      top: "4px",
-      left: '50%',
-      textAlign: "center",
-      subtextStyle: {
-        color: colors[0]
-      }
-    },
-    {
-      text: "Data source from benchmarksgame-team.pages.debian.net\nRender by GoodManWEN/Programming-Language-Benchmarks-Visualization.git",
-      link: "https://github.com/GoodManWEN/Programming-Language-Benchmarks-Visualization",
-      textStyle: {
-        fontStyle: "normal",
-        fontFamily: "Arial",
-        fontWeight: "normal",
-        color: colors[0],
-        opacity: 0.5,
-        fontSize: 13,
-        lineHeight: 16,
+      {
+        text: "Data source from benchmarksgame-team.pages.debian.net\nRender by GoodManWEN/Programming-Language-Benchmarks-Visualization.git",
+        link: "https://github.com/GoodManWEN/Programming-Language-Benchmarks-Visualization",
+        textStyle: {
+          fontStyle: "normal",
+          fontFamily: "Arial",
+          fontWeight: "normal",
+          color: colors[0],
+          opacity: 0.5,
+          fontSize: 13,
+          lineHeight: 16,
+        },
+        top: 'bottom',
+        left: 'right',
+      },
+      {
+        text: "Update date: "+render_date,
+        textStyle: {
+          fontStyle: "normal",
+          fontFamily: "Arial",
+          fontWeight: "normal",
+          color: colors[0],
+          opacity: 0.5,
+          fontSize: 14,
+        },
+        top: "28px",
+        left: 'right',
       },
-      top: 'bottom',
-      left: 'right',
+    ],
+    tooltip: {
+      trigger: 'axis',
     },
-    {
-      text: "Update date: "+render_date,
+    legend: {
+      data: ['Time consumption(multiplier)','Ranking (weighted by time and memory)'],
+      top: '30px',
+      left: '23%',
       textStyle: {
-        fontStyle: "normal",
-        fontFamily: "Arial",
-        fontWeight: "normal",
-        color: colors[0],
-        opacity: 0.5,
-        fontSize: 14,
+        fontSize: 15,
       },
-      top: "28px",
-      left: 'right',
-    },
-  ],
-  tooltip: {
-    trigger: 'axis',
-  },
-  legend: {
-    data: ['Time consumption(multiplier)','Ranking (weighted by time and memory)'],
-    top: '30px',
-    left: '23%',
-    textStyle: {
-      fontSize: 15,
-    },
-  },
-  grid: {
-    left: '3%',
-    right: '4%',
-    bottom: '3%',
-    containLabel: true
-  },
-  xAxis: {
-    type: 'value',
-    name: 'Time consumption\n(multiplier)',
-    nameLocation: "start",
-    min: 0,
-    max: value => Math.round(Math.min(value.max * 1.08, value.max + 10)),
-    splitLine: {
-      show: false,
-    },
-    axisLabel: {
-      formatter: '{value}x',
-      fontSize: 15,
     },
-  },
-  yAxis: {
-    type: 'category',
-    name: 'Language',
-    nameLocation: "start",
-    data: raw_data.map(item => item[0]),
-    axisLine: {
-      lineStyle: {
-        color: colors[0]
-      }
+    grid: {
+      left: '3%',
+      right: '4%',
+      bottom: '3%',
+      containLabel: true
     },
-    axisLabel: {
-      fontSize: 15,
+    xAxis: {
+      type: 'value',
+      name: 'Time consumption\n(multiplier)',
+      nameLocation: "start",
+      min: 0,
+      max: value => Math.round(Math.min(value.max * 1.08, value.max + 10)),
+      splitLine: {
+        show: false,
+      },
+      axisLabel: {
+        formatter: '{value}x',
+        fontSize: 15,
+      },
     },
-    inverse: true,
-  },
-  series: [
-    {
-      name: 'Time consumption(multiplier)',
-      type: 'bar',
-      itemStyle: {
-        color: colors[2],
-        opacity:0.8,
+    yAxis: {
+      type: 'category',
+      name: 'Language',
+      nameLocation: "start",
+      data: raw_data.map(item => item[0]),
+      axisLine: {
+        lineStyle: {
+          color: colors[0]
+        }
       },
-      data:  raw_data.map(item => item[1]),
-      label: {
-        show: true,
-        position: 'right',
-        color: colors[0],
-        fontSize: 14,
-        formatter: '{c}x',
+      axisLabel: {
+        fontSize: 15,
       },
+      inverse: true,
     },
-    {
-      name: 'Ranking (weighted by time and memory)',
-      type: 'pie',
-      itemStyle: {
-        color: colors[6],
-        opacity:0.88,
+    series: [
+      {
+        name: 'Time consumption(multiplier)',
+        type: 'bar',
+        itemStyle: {
+          color: colors[2],
+          opacity:0.8,
+        },
+        data:  raw_data.map(item => item[1]),
+        label: {
+          show: true,
+          position: 'right',
+          color: colors[0],
+          fontSize: 14,
+          formatter: '{c}x',
+        },
       },
-      label: {
-        show: true,
-        position: 'right',
-        color: colors[4],
-        formatter: '{c}x',
+      {
+        name: 'Ranking (weighted by time and memory)',
+        type: 'pie',
+        itemStyle: {
+          color: colors[6],
+          opacity:0.88,
+        },
+        label: {
+          show: true,
+          position: 'right',
+          color: colors[4],
+          formatter: '{c}x',
+        },
       },
+    ],
+  };
+  let option2 = {
+    tooltip: {
+      trigger: 'axis',
     },
-  ],
-};
-let option2 = {
-  tooltip: {
-    trigger: 'axis',
-  },
-  legend: {
-    data: []
-  },
-  grid: {
-    left: '3%',
-    right: '4%',
-    bottom: '3%',
-    containLabel: true
-  },
-  xAxis: {
-    type: 'value',
-    inverse: true,
-    splitArea: {
-      show: true,
+    legend: {
+      data: []
     },
-    axisLabel: {
-      opacity: 0,
-      fontSize: 15,
+    grid: {
+      left: '3%',
+      right: '4%',
+      bottom: '3%',
+      containLabel: true
     },
-    splitLine: {
-      lineStyle: {
-        color: colors[1],
-        opacity: 0.5
+    xAxis: {
+      type: 'value',
+      inverse: true,
+      splitArea: {
+        show: true,
+      },
+      axisLabel: {
+        opacity: 0,
+        fontSize: 15,
+      },
+      splitLine: {
+        lineStyle: {
+          color: colors[1],
+          opacity: 0.5
+        }
+      },
+    },
+    yAxis: {
+      type: 'category',
+      data: raw_data.map(item => item[0]),
+      inverse: true,
+      axisLabel: {
+        opacity: 0,
+        fontSize: 15,
       }
     },
-  },
-  yAxis: {
-    type: 'category',
-    data: raw_data.map(item => item[0]),
-    inverse: true,
-    axisLabel: {
-      opacity: 0,
-      fontSize: 15,
-    }
-  },
-  series: [
-    {
-      name: 'Time',
-      type: 'bar',
-      itemStyle: {
-        color: colors[3],
-        opacity:0.8,
-      },
-      data:  raw_data.map(item => raw_data.length + 1 - item[2]),
-      label: {
-        show: true,
-        position: 'right',
-        color: colors[4],
-        fontSize: 14,
-        formatter: (params) => {
-          let num = raw_data.length - params.data + 1;
-          let str = ""
-          if (num < 10) {
-            str = '  ' + num
-          }
-          else {
-            str = num.toString()
-          }
-          if (str.substr(str.length-1,1) === '1' ) {
-            str += "st"
-          } else if (str.substr(str.length-1,1) === '2' ) {
-            str += "nd"
-          } else if (str.substr(str.length-1,1) === '3' ) {
-            str += "rd"
-          } else {
-            str += "th"
-          }
-          return str
+    series: [
+      {
+        name: 'Time',
+        type: 'bar',
+        itemStyle: {
+          color: colors[3],
+          opacity:0.8,
+        },
+        data:  raw_data.map(item => raw_data.length + 1 - item[2]),
+        label: {
+          show: true,
+          position: 'right',
+          color: colors[4],
+          fontSize: 14,
+          formatter: (params) => {
+            let num = raw_data.length - params.data + 1;
+            let str = ""
+            if (num < 10) {
+              str = '  ' + num
+            }
+            else {
+              str = num.toString()
+            }
+            if (str.substr(str.length-1,1) === '1' ) {
+              str += "st"
+            } else if (str.substr(str.length-1,1) === '2' ) {
+              str += "nd"
+            } else if (str.substr(str.length-1,1) === '3' ) {
+              str += "rd"
+            } else {
+              str += "th"
+            }
+            return str
+          },
         },
       },
-    },
-  ],
-};
-myChart.setOption(option);
-myChart2.setOption(option2);
+    ],
+  };
+  myChart.setOption(option);
+  myChart2.setOption(option2);
+  return ready
+}
+
+window.chartsReady = loadData().then(data => draw(data.raw_data, data.render_date))
@@ -6,7 +6,9 @@
 # modified by Joerg Baumann
 
 import sys
-import multiprocessing as mp
+from multiprocessing import cpu_count, Pool
+from contextlib import nullcontext
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 
 def make_tree(d):
 
@@ -48,33 +50,36 @@ def main(n, min_depth=4):
 
     max_depth = max(min_depth + 2, n)
     stretch_depth = max_depth + 1
-    if mp.cpu_count() > 1:
-        pool = mp.Pool()
+    if cpu_count() > 1:
+        with phase("pool"):
+            pool = Pool(cpu_count())
         chunkmap = pool.map
     else:
+        pool = nullcontext()
         chunkmap = map
 
-    print('stretch tree of depth {0}\t check: {1}'.format(
-          stretch_depth, make_check((0, stretch_depth))))
+    # the pool is shut down on the way out, repeat mode would pile up one per iteration
+    with pool, phase("compute"):
+        print('stretch tree of depth {0}\t check: {1}'.format(
+              stretch_depth, make_check((0, stretch_depth))))
 
-    long_lived_tree = make_tree(max_depth)
+        long_lived_tree = make_tree(max_depth)
 
-    mmd = max_depth + min_depth
-    for d in range(min_depth, stretch_depth, 2):
-        i = 2 ** (mmd - d)
-        cs = 0
-        for argchunk in get_argchunks(i,d):
-            cs += sum(chunkmap(make_check, argchunk))
-        print('{0}\t trees of depth {1}\t check: {2}'.format(i, d, cs))
+        mmd = max_depth + min_depth
+        for d in range(min_depth, stretch_depth, 2):
+            i = 2 ** (mmd - d)
+            cs = 0
+            for argchunk in get_argchunks(i,d):
+                cs += sum(chunkmap(make_check, argchunk))
+            print('{0}\t trees of depth {1}\t check: {2}'.format(i, d, cs))
 
-    print('long lived tree of depth {0}\t check: {1}'.format(
-          max_depth, check_tree(long_lived_tree)))
+        print('long lived tree of depth {0}\t check: {1}'.format(
+              max_depth, check_tree(long_lived_tree)))
 
 
 if __name__ == '__main__':
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, cpu_count, Pool
 
-    with timeit():
-        main(int(sys.argv[1]))
\ No newline at end of file
+    timeit().measure(main, int(sys.argv[1]))
\ No newline at end of file
@@ -8,6 +8,7 @@ from sys import argv
 from math import factorial
 from multiprocessing import cpu_count, Pool
 from itertools import islice, starmap
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 
 def permutations(n, start, size):
     p = bytearray(range(n))
@@ -94,18 +95,21 @@ def fannkuch(n):
         task_args = [(n, i * task_size, task_size) for i in range(task_count)]
 
         if task_count > 1:
-            with Pool() as pool:
+            with phase("pool"):
+                pool = Pool(task_count)
+            with pool, phase("compute"):
                 checksums, maximums = zip(*pool.starmap(task, task_args))
         else:
-            checksums, maximums = zip(*starmap(task, task_args))
+            with phase("compute"):
+                checksums, maximums = zip(*starmap(task, task_args))
 
         checksum, maximum = sum(checksums), max(maximums)
-        print("{0}\nPfannkuchen({1}) = {2}".format(checksum, n, maximum))
+        with phase("write"):
+            print("{0}\nPfannkuchen({1}) = {2}".format(checksum, n, maximum))
 
 if __name__ == "__main__":
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, cpu_count, Pool
 
-    with timeit():
-        fannkuch(int(argv[1]))
\ No newline at end of file
+    timeit().measure(fannkuch, int(argv[1]))
\ No newline at end of file
@@ -5,6 +5,7 @@
 
 from bisect import bisect
 from contextlib import closing, contextmanager
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 from itertools import accumulate, chain, islice, zip_longest
 from multiprocessing import Lock, RawValue, Process
 from os import cpu_count
@@ -185,8 +186,9 @@ CCACTGCACTCCAGCCTGGGCGACAGAGCGAGACTCCGTCTCAAAAA
     ]
 
     if cpu_count() < 2:
-        for func, args in tasks:
-            func(*args)
+        with phase("compute"):
+            for func, args in tasks:
+                func(*args)
     else:
         written_1 = acquired_lock()
         seeded_2 = acquired_lock()
@@ -198,22 +200,24 @@ CCACTGCACTCCAGCCTGGGCGACAGAGCGAGACTCCGTCTCAAAAA
             (seeded_2, None, written_2, None),
         ]
 
-        processes = [
-            started_process(target, args + [locks_sets[i]])
-                for i, (target, args) in enumerate(tasks)
-        ]
+        with phase("pool"):
+            processes = [
+                started_process(target, args + [locks_sets[i]])
+                    for i, (target, args) in enumerate(tasks)
+            ]
 
-        for p in processes:
-            p.join()
+        # the workers write their part of the output themselves
+        with phase("compute"):
+            for p in processes:
+                p.join()
 
 if __name__ == "__main__":
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, cpu_count, Process
 
     if sys.argv[2] == 'speedtest':
-        with timeit():
-            fasta(int(argv[1]))
+        timeit().measure(fasta, int(argv[1]))
     elif sys.argv[2] == 'nospeedtest':
         fasta(int(argv[1]))
     else:
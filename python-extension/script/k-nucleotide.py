@@ -8,6 +8,7 @@ from sys import stdin
 from collections import defaultdict
 from itertools import starmap, chain
 from multiprocessing import Pool
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 
 lean_buffer = {}
 
@@ -149,7 +150,8 @@ def main():
     def display_list(k_nucleotides):
         return [(n, len(n), str_to_bits(n)) for n in k_nucleotides]
 
-    sequence = read_sequence(stdin.buffer, b'THREE', translation)
+    with phase("read"):
+        sequence = read_sequence(stdin.buffer, b'THREE', translation)
 
     mono_nucleotides = ('G', 'A', 'T', 'C')
     di_nucleotides = tuple(n + m
@@ -170,22 +172,26 @@ def main():
             for i in range(len(partitions) - 1)]
 
     if n == 1:
-        results = list(chain(*starmap(count_frequencies, count_jobs)))
+        with phase("compute"):
+            results = list(chain(*starmap(count_frequencies, count_jobs)))
     else:
         lean_jobs = list(starmap(lean_args, count_jobs))
-        with Pool() as pool:
+        with phase("pool"):
+            pool = Pool(n)
+        with pool, phase("compute"):
             async_results = pool.starmap_async(
                 lean_call(count_frequencies), lean_jobs)
             results = list(chain(*async_results.get()))
 
-    display(results, display_list(mono_nucleotides), relative=True, sort=True)
-    display(results, display_list(di_nucleotides), relative=True, sort=True)
-    display(results, display_list(k_nucleotides), end='')
+    with phase("write"):
+        display(results, display_list(mono_nucleotides), relative=True, sort=True)
+        display(results, display_list(di_nucleotides), relative=True, sort=True)
+        display(results, display_list(k_nucleotides), end='')
 
 if __name__=='__main__' :
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, cpu_count, Pool
 
     with timeit():
         main()
\ No newline at end of file
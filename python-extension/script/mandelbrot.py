@@ -4,7 +4,9 @@
 # contributed by Joerg Baumann
 
 from contextlib import closing
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 from itertools import islice
+from multiprocessing import Pool
 from os import cpu_count
 from sys import argv, stdout
 
@@ -57,8 +59,10 @@ def compute_rows(n, f):
     if cpu_count() < 2:
         yield from map(f, row_jobs)
     else:
-        from multiprocessing import Pool
-        with Pool() as pool:
+        # rows are computed while they are written, only the pool startup is a phase of its own
+        with phase("pool"):
+            pool = Pool(cpu_count())
+        with pool:
             unordered_rows = pool.imap_unordered(f, row_jobs)
             yield from ordered_rows(unordered_rows, n)
 
@@ -73,7 +77,6 @@ def mandelbrot(n):
 if __name__ == '__main__':
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, cpu_count, Pool
 
-    with timeit():
-        mandelbrot(int(argv[1]))
\ No newline at end of file
+    timeit().measure(mandelbrot, int(argv[1]))
\ No newline at end of file
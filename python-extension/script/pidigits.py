@@ -68,29 +68,30 @@ def main():
     GMP.__gmpz_init_set_ui(byref(num), c_ulong(1))
 
 
-    i=0
-    k=0
-    while i<n:
-        k+=1
-        next_Term(k)
-        if GMP.__gmpz_cmp(byref(num), byref(acc))>0:
-            continue
+    # digits are printed as they are found, so this includes writing them out
+    with phase("compute"):
+        i=0
+        k=0
+        while i<n:
+            k+=1
+            next_Term(k)
+            if GMP.__gmpz_cmp(byref(num), byref(acc))>0:
+                continue
 
 
-        d=extract_Digit(3)
-        if d!=extract_Digit(4):
-            continue
+            d=extract_Digit(3)
+            if d!=extract_Digit(4):
+                continue
 
 
-        print(chr(48+d), end="")
-        i+=1
-        if i%10==0:
-            print("\t:%d" % (i))
-        eliminate_Digit(d)
+            print(chr(48+d), end="")
+            i+=1
+            if i%10==0:
+                print("\t:%d" % (i))
+            eliminate_Digit(d)
 
 import sys
 sys.path.append("../timer")
-from timer_embedded import timeit
+from timer_embedded import timeit, phase
 
-with timeit():
-    main()
\ No newline at end of file
+timeit().measure(main)
\ No newline at end of file
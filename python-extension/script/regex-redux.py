@@ -57,6 +57,69 @@ def replace(pattern, replacement, src_String, src_String_Length,
     return dst_String, dst_String_Length.value
 
 
+# Count how many matches there are for pattern_To_Count in sequences.
+def count_Matches(pattern_To_Count, sequences, sequences_Length):
+    match_Data=PCRE2.pcre2_match_data_create_8(c_uint32(1), None)
+    match=PCRE2.pcre2_get_ovector_pointer_8(match_Data)
+
+    match.contents[1]=0
+    match_Count=0
+
+    # Compile the pattern and also enable JIT compilation to make
+    # matching faster.
+    regex=PCRE2.pcre2_compile_8(pattern_To_Count,
+      c_size_t(len(pattern_To_Count)), c_uint32(0), byref(c_int()),
+      byref(c_size_t()), None)
+    PCRE2.pcre2_jit_compile_8(regex, c_uint32(0x1))
+
+    while PCRE2.pcre2_jit_match_8(regex,
+      sequences, c_size_t(sequences_Length),
+      c_size_t(match.contents[1]), c_uint32(0), match_Data, None)>=0:
+        match_Count+=1
+
+    PCRE2.pcre2_match_data_free_8(match_Data)
+    PCRE2.pcre2_code_free_8(regex)
+
+    return match_Count
+
+
+# Make all the (pattern, replacement) replacements, one after another, to a
+# copy of the sequences string and return the length of the result.
+def replace_All(replacements, sequences, sequences_Length):
+    # We'll use two strings when doing all the replacements, searching
+    # for patterns in prereplace_String and using postreplace_String to
+    # store the string after the replacements have been made. After
+    # each iteration these two then get swapped. Make both strings 10%
+    # larger than the sequences string in order to accomodate some of
+    # the replacements causing sequences to grow and also copy the
+    # sequences string into prereplace_String for the initial iteration.
+    string_Capacities=int(sequences_Length*1.1)
+    prereplace_String=create_string_buffer(sequences.raw,
+      string_Capacities)
+    prereplace_String_Length=sequences_Length
+    postreplace_String=create_string_buffer(string_Capacities)
+    postreplace_String_Length=string_Capacities
+
+    # Iterate through all the (pattern, replacement) tuples in the task.
+    for pattern, replacement in replacements:
+        postreplace_String, postreplace_String_Length=replace(
+          pattern, replacement,
+          prereplace_String, prereplace_String_Length,
+          postreplace_String, postreplace_String_Length)
+
+        # Swap prereplace_String and postreplace_String in preparation
+        # for the next iteration.
+        prereplace_String, postreplace_String= \
+          postreplace_String, prereplace_String
+        prereplace_String_Length=postreplace_String_Length
+        postreplace_String_Length=string_Capacities
+
+    # If any replacements were made, they'll be in prereplace_String
+    # instead of postreplace_String because of the swap done after each
+    # iteration.
+    return prereplace_String_Length
+
+
 # This function is used as the main function for the worker subprocesses. The
 # worker subprocesses communicate with the manager process via worker_Pipe. The
 # worker subprocesses receive tasks from the manager process, complete the
@@ -89,28 +152,7 @@ def process_Task(worker_Pipe, sequences, sequences_Length):
         # index_For_Pattern_To_Count in count_Info[].
         elif type(task[0]) is int:
             index_For_Pattern_To_Count, pattern_To_Count=task
-
-            match_Data=PCRE2.pcre2_match_data_create_8(c_uint32(1), None)
-            match=PCRE2.pcre2_get_ovector_pointer_8(match_Data)
-
-            match.contents[1]=0
-            match_Count=0
-
-            # Compile the pattern and also enable JIT compilation to make
-            # matching faster.
-            regex=PCRE2.pcre2_compile_8(pattern_To_Count,
-              c_size_t(len(pattern_To_Count)), c_uint32(0), byref(c_int()),
-              byref(c_size_t()), None)
-            PCRE2.pcre2_jit_compile_8(regex, c_uint32(0x1))
-
-            # Count how many matches there are for pattern in sequences.
-            while PCRE2.pcre2_jit_match_8(regex,
-              sequences, c_size_t(sequences_Length),
-              c_size_t(match.contents[1]), c_uint32(0), match_Data, None)>=0:
-                match_Count+=1
-
-            PCRE2.pcre2_match_data_free_8(match_Data)
-            PCRE2.pcre2_code_free_8(regex)
+            match_Count=count_Matches(pattern_To_Count, sequences, sequences_Length)
 
             # Send the result back to the manager process.
             worker_Pipe.send((index_For_Pattern_To_Count, match_Count))
@@ -119,62 +161,34 @@ def process_Task(worker_Pipe, sequences, sequences_Length):
         # made to the sequences string using all the (pattern, replacement)
         # tuples in the task.
         else:
+            postreplace_Length=replace_All(task, sequences, sequences_Length)
 
-            # We'll use two strings when doing all the replacements, searching
-            # for patterns in prereplace_String and using postreplace_String to
-            # store the string after the replacements have been made. After
-            # each iteration these two then get swapped. Make both strings 10%
-            # larger than the sequences string in order to accomodate some of
-            # the replacements causing sequences to grow and also copy the
-            # sequences string into prereplace_String for the initial iteration.
-            string_Capacities=int(sequences_Length*1.1)
-            prereplace_String=create_string_buffer(sequences.raw,
-              string_Capacities)
-            prereplace_String_Length=sequences_Length
-            postreplace_String=create_string_buffer(string_Capacities)
-            postreplace_String_Length=string_Capacities
-
-            # Iterate through all the (pattern, replacement) tuples in the task.
-            for pattern, replacement in task:
-                postreplace_String, postreplace_String_Length=replace(
-                  pattern, replacement,
-                  prereplace_String, prereplace_String_Length,
-                  postreplace_String, postreplace_String_Length)
-
-                # Swap prereplace_String and postreplace_String in preparation
-                # for the next iteration.
-                prereplace_String, postreplace_String= \
-                  postreplace_String, prereplace_String
-                prereplace_String_Length=postreplace_String_Length
-                postreplace_String_Length=string_Capacities
-
-            # If any replacements were made, they'll be in prereplace_String
-            # instead of postreplace_String because of the swap done after each
-            # iteration. Send its length back to the manager process.
-            worker_Pipe.send(prereplace_String_Length)
-
+            # Send the length after the replacements back to the manager process.
+            worker_Pipe.send(postreplace_Length)
 
 if __name__ == '__main__':
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, cpu_count, Process
 
-    with timeit():
+    with timeit() as timer:
         # Read in input from stdin and also get the input_Length.
-        input=stdin.buffer.read()
-        input_Length=len(input)
+        with timer.phase("read"):
+            input=stdin.buffer.read()
+            input_Length=len(input)
 
 
         # Set up some shared memory for the sequences string so that it can be
         # shared between all the processes and make it the same length as the
         # input_Length.
-        sequences=RawArray(c_char, input_Length)
-        sequences_Length=input_Length
+        with timer.phase("compute"):
+            sequences=RawArray(c_char, input_Length)
+            sequences_Length=input_Length
 
-        # Find all sequence descriptions and new lines in input, replace them
-        # with empty strings, and store the result in the sequences string.
-        sequences, sequences_Length=replace(b">.*\\n|\\n", b"", input, input_Length,
-          sequences, sequences_Length)
+            # Find all sequence descriptions and new lines in input, replace them
+            # with empty strings, and store the result in the sequences string.
+            sequences, sequences_Length=replace(b">.*\\n|\\n", b"", input, input_Length,
+              sequences, sequences_Length)
 
         # We'll be using the sequences string instead of the input string from now
         # on so delete our reference to it since this can often free up the memory
@@ -182,29 +196,13 @@ if __name__ == '__main__':
         del input
 
 
-        # Start a worker subprocess on each processor that is available to us and
-        # send each worker subprocess the sequences string & a worker_Pipe to use
-        # for communicating with the manager process.
-        manager_Pipes=[]
-        for i in range(cpu_count() or 1):
-            manager_Pipe, worker_Pipe=Pipe()
-            manager_Pipes.append(manager_Pipe)
-            Process(target=process_Task,
-              args=(worker_Pipe, sequences, sequences_Length)).start()
-
-
-        # Wait for the first worker subproces to send us a None object that
-        # indicates it's ready to start processing tasks and then have it start
-        # working on performing all the replacements serially.
-        manager_Pipes[0].recv()
-        manager_Pipes[0].send((
+        replacements=(
             (b"tHa[Nt]", b"<4>"),
             (b"aND|caN|Ha[DS]|WaS", b"<3>"),
             (b"a[NSt]|BY", b"<2>"),
             (b"<[^>]*>", b"|"),
             (b"\\|[^|][^|]*\\|", b"-")
-          ))
-
+          )
 
         count_Info=[
             b"agggtaaa|tttaccct",
@@ -218,57 +216,90 @@ if __name__ == '__main__':
             b"agggtaa[cgt]|[acg]ttaccct"
           ]
 
-        # Now the manger process needs to start managing all the worker subprocesses
-        # by waiting for them to become ready to process tasks, handling any results
-        # that they send back, sending them any remaining counting tasks, and then
-        # finally telling them when it's OK for them to exit (when there are no more
-        # tasks to process).
-        index_For_Next_Count=0
-        while manager_Pipes:
-
-            # Wait for any one of the manager_Pipes to receive something.
-            for manager_Pipe in wait(manager_Pipes):
-                result=manager_Pipe.recv()
-
-                # If the result is an int, then it's the postreplace_Length that
-                # resulted after applying all the replacments that were specified
-                # above.
-                if type(result) is int:
-                    postreplace_Length=result
-
-                # If the result is a tuple, then it's the results from one of the
-                # counting tasks for the patterns in count_Info[]. The first element
-                # is the index of the pattern that the result is for and the second
-                # element is the number of matches for it. Add the number of matches
-                # to count_Info[].
-                elif type(result) is tuple:
-                    count_Info[result[0]]=[count_Info[result[0]], result[1]]
-
-
-                # Send the worker subprocess the index_For_Next_Count and pattern to
-                # work on if we haven't reached the end of count_Info[] yet.
-                if index_For_Next_Count<len(count_Info):
-                    manager_Pipe.send((index_For_Next_Count,
-                      count_Info[index_For_Next_Count]))
-                    index_For_Next_Count+=1
-
-                # If we have reached the end of count_Info[] then there are no more
-                # tasks to start working on so just send the worker subprocess None
-                # to indicate it can exit and also stop keeping track of the
-                # manger_Pipe for it.
-                else:
-                    manager_Pipe.send(None)
-                    manager_Pipes.remove(manager_Pipe)
-
-
-        # Print the match_Count for each pattern in count_Info[].
-        for pattern, match_Count in count_Info:
-            print(pattern.decode(), match_Count)
-
-        # Print the size of the original input, the size of the input without the
-        # sequence descriptions & new lines, and the size after having made all the
-        # replacements.
-        print()
-        print(input_Length)
-        print(sequences_Length)
-        print(postreplace_Length)
\ No newline at end of file
+        # With a single worker there is nothing to overlap, so do all the tasks
+        # in this process instead of paying for a subprocess and the pipes. This
+        # is the serial baseline that a worker sweep measures speedup against.
+        if cpu_count()==1:
+            with timer.phase("compute"):
+                postreplace_Length=replace_All(replacements, sequences,
+                  sequences_Length)
+                count_Info=[[pattern, count_Matches(pattern, sequences,
+                  sequences_Length)] for pattern in count_Info]
+
+        else:
+            # Start a worker subprocess on each processor that is available to us and
+            # send each worker subprocess the sequences string & a worker_Pipe to use
+            # for communicating with the manager process.
+            with timer.phase("pool"):
+                manager_Pipes=[]
+                for i in range(cpu_count() or 1):
+                    manager_Pipe, worker_Pipe=Pipe()
+                    manager_Pipes.append(manager_Pipe)
+                    Process(target=process_Task,
+                      args=(worker_Pipe, sequences, sequences_Length)).start()
+
+
+            # Wait for the first worker subproces to send us a None object that
+            # indicates it's ready to start processing tasks and then have it start
+            # working on performing all the replacements serially.
+            with timer.phase("compute"):
+                manager_Pipes[0].recv()
+                manager_Pipes[0].send(replacements)
+
+
+            # Now the manger process needs to start managing all the worker subprocesses
+            # by waiting for them to become ready to process tasks, handling any results
+            # that they send back, sending them any remaining counting tasks, and then
+            # finally telling them when it's OK for them to exit (when there are no more
+            # tasks to process).
+            with timer.phase("compute"):
+                index_For_Next_Count=0
+                while manager_Pipes:
+
+                    # Wait for any one of the manager_Pipes to receive something.
+                    for manager_Pipe in wait(manager_Pipes):
+                        result=manager_Pipe.recv()
+
+                        # If the result is an int, then it's the postreplace_Length that
+                        # resulted after applying all the replacments that were specified
+                        # above.
+                        if type(result) is int:
+                            postreplace_Length=result
+
+                        # If the result is a tuple, then it's the results from one of the
+                        # counting tasks for the patterns in count_Info[]. The first element
+                        # is the index of the pattern that the result is for and the second
+                        # element is the number of matches for it. Add the number of matches
+                        # to count_Info[].
+                        elif type(result) is tuple:
+                            count_Info[result[0]]=[count_Info[result[0]], result[1]]
+
+
+                        # Send the worker subprocess the index_For_Next_Count and pattern to
+                        # work on if we haven't reached the end of count_Info[] yet.
+                        if index_For_Next_Count<len(count_Info):
+                            manager_Pipe.send((index_For_Next_Count,
+                              count_Info[index_For_Next_Count]))
+                            index_For_Next_Count+=1
+
+                        # If we have reached the end of count_Info[] then there are no more
+                        # tasks to start working on so just send the worker subprocess None
+                        # to indicate it can exit and also stop keeping track of the
+                        # manger_Pipe for it.
+                        else:
+                            manager_Pipe.send(None)
+                            manager_Pipes.remove(manager_Pipe)
+
+
+        with timer.phase("write"):
+            # Print the match_Count for each pattern in count_Info[].
+            for pattern, match_Count in count_Info:
+                print(pattern.decode(), match_Count)
+
+            # Print the size of the original input, the size of the input without the
+            # sequence descriptions & new lines, and the size after having made all the
+            # replacements.
+            print()
+            print(input_Length)
+            print(sequences_Length)
+            print(postreplace_Length)
\ No newline at end of file
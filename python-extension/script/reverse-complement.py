@@ -50,30 +50,37 @@ def reverse_and_print_task(q, c, v):
 if __name__=='__main__' :
    import sys
    sys.path.append("../timer")
-   from timer_embedded import timeit
+   from timer_embedded import timeit, cpu_count, Process
 
-   with timeit():
+   with timeit() as timer:
       write = stdout.buffer.write
       flush = stdout.buffer.flush
 
       s = read_sequences(stdin.buffer)
-      data = next(s)
+      with timer.phase("read"):
+         data = next(s)
       if cpu_count() == 1 or len(data[1]) < 1000000:
          from itertools import starmap
          def merge(v, g):
             yield v; yield from g
-         for h, r in starmap(reverse_complement, merge(data, s)):
-            write(h); write(r)
+         # the remaining sequences are read, reversed and written one by one
+         with timer.phase("compute"):
+            for h, r in starmap(reverse_complement, merge(data, s)):
+               write(h); write(r)
       else:
-         from multiprocessing import Process, Queue, Value, Condition
+         from multiprocessing import Queue, Value, Condition
          from ctypes import c_int
 
-         data = [data] + list(s)
-         q, c, v = (Queue(), Condition(), Value(c_int, 0))
-         processes = [Process(target=reverse_and_print_task, args=(q, c, v))
-            for _ in range(min(len(data), cpu_count()))]
+         with timer.phase("read"):
+            data = [data] + list(s)
+         with timer.phase("pool"):
+            q, c, v = (Queue(), Condition(), Value(c_int, 0))
+            processes = [Process(target=reverse_and_print_task, args=(q, c, v))
+               for _ in range(min(len(data), cpu_count()))]
 
-         for p in processes: p.start()
-         for i in range(len(data)): q.put(i)
-         for p in processes: q.put(None)
-         for p in processes: p.join()
\ No newline at end of file
+            for p in processes: p.start()
+         # the workers write their results themselves
+         with timer.phase("compute"):
+            for i in range(len(data)): q.put(i)
+            for p in processes: q.put(None)
+            for p in processes: p.join()
\ No newline at end of file
@@ -11,10 +11,11 @@
 # Optimized math by Adam Beckmeyer
 
 
-from itertools import repeat
+from itertools import repeat, starmap
 from math import sqrt
 from multiprocessing import Pool
 from sys import argv
+from contextlib import nullcontext as phase  # timer_embedded.phase when timed
 
 
 def eval_A(i, j):
@@ -30,6 +31,19 @@ def At_sum(u, i):
     return sum(u_j / eval_A(j, i) for j, u_j in enumerate(u))
 
 
+class SerialPool:
+    # Stand-in for Pool that maps in this process, the 1 worker baseline of a worker sweep
+    # should not pay for a subprocess and pickling
+    def starmap(self, func, iterable):
+        return list(starmap(func, iterable))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
 def multiply_AtAv(u):
     r = range(len(u))
 
@@ -47,25 +61,33 @@ def main():
     n = int(argv[1])
     u = [1] * n
 
-    for _ in range(10):
-        v = multiply_AtAv(u)
-        u = multiply_AtAv(v)
+    with phase("compute"):
+        for _ in range(10):
+            v = multiply_AtAv(u)
+            u = multiply_AtAv(v)
 
-    vBv = vv = 0
+        vBv = vv = 0
 
-    for ue, ve in zip(u, v):
-        vBv += ue * ve
-        vv  += ve * ve
+        for ue, ve in zip(u, v):
+            vBv += ue * ve
+            vv  += ve * ve
 
-    result = sqrt(vBv/vv)
-    print("{0:.9f}".format(result))
+        result = sqrt(vBv/vv)
+    with phase("write"):
+        print("{0:.9f}".format(result))
 
 
 if __name__ == '__main__':
     import sys
     sys.path.append("../timer")
-    from timer_embedded import timeit
+    from timer_embedded import timeit, phase, workers, Pool
+
+    def run():
+        # multiply_AtAv uses the module level pool
+        global pool
+        with phase("pool"):
+            pool = SerialPool() if workers == 1 else Pool(processes=workers or 4)
+        with pool:
+            main()
 
-    with timeit():
-        with Pool(processes=4) as pool:
-            main()
\ No newline at end of file
+    timeit().measure(run)
\ No newline at end of file
@@ -0,0 +1,72 @@
+# Small robust statistics helpers for benchmark samples, pure Python so that every
+# interpreter under test (and update_and_render.py) can use them without extra packages.
+
+import math
+import random
+
+def median(xs):
+    xs = sorted(xs)
+    mid = len(xs) // 2
+    return xs[mid] if len(xs) % 2 else (xs[mid - 1] + xs[mid]) / 2
+
+def mean(xs):
+    return sum(xs) / len(xs)
+
+def trimmed_mean(xs, proportion=0.1):
+    # Mean after dropping `proportion` of the samples at each end
+    xs = sorted(xs)
+    cut = int(len(xs) * proportion)
+    return mean(xs[cut:len(xs) - cut] or xs)
+
+estimator_map = {
+    'median': median,
+    'trimmed_mean': trimmed_mean,
+    'mean': mean,
+}
+
+def reject_outliers(xs, threshold=3.5):
+    # Drop samples whose modified z-score, based on the median absolute deviation, is above
+    # `threshold` (Iglewicz and Hoaglin). When more than half the samples are identical the MAD
+    # is 0 and the mean absolute deviation is used instead, with no spread at all nothing is rejected.
+    if len(xs) < 3:
+        return list(xs)
+    center = median(xs)
+    deviations = [abs(x - center) for x in xs]
+    mad = median(deviations)
+    if mad:
+        scale = mad / 0.6745
+    else:
+        scale = 1.253314 * mean(deviations)
+        if not scale:
+            return list(xs)
+    return [x for x, d in zip(xs, deviations) if d / scale <= threshold]
+
+def bootstrap_ci(xs, estimator=median, confidence=0.95, resamples=1000, seed=0):
+    # Percentile bootstrap interval of `estimator`, seeded so the same samples give the same interval.
+    # No resamples means no interval, just the estimate.
+    if len(xs) < 2 or resamples <= 0:
+        estimate = estimator(xs)
+        return estimate, estimate
+    rng = random.Random(seed)
+    n = len(xs)
+    estimates = sorted(estimator([xs[rng.randrange(n)] for _ in range(n)]) for _ in range(resamples))
+    alpha = (1 - confidence) / 2
+    low = estimates[int(math.floor(alpha * (resamples - 1)))]
+    high = estimates[int(math.ceil((1 - alpha) * (resamples - 1)))]
+    return low, high
+
+def summarize(xs, estimator='median', confidence=0.95, resamples=1000, seed=0):
+    kept = reject_outliers(xs)
+    func = estimator_map[estimator]
+    estimate = func(kept)
+    low, high = bootstrap_ci(kept, func, confidence, resamples, seed)
+    half_width = (high - low) / 2
+    return {
+        'estimate': estimate,
+        'ci_low': low,
+        'ci_high': high,
+        'half_width': half_width,
+        'relative_half_width': half_width / estimate if estimate else math.inf,
+        'samples': len(xs),
+        'rejected': len(xs) - len(kept),
+    }
@@ -0,0 +1,285 @@
+# Runs one benchmark command again and again until its time is known precisely enough.
+#
+# Every run writes its sample to a shard tagged with this runner's TIMER_RUN_ID. After each run
+# the samples so far are summarized, and the loop stops once the confidence interval half-width
+# is within --target of the estimate (and --min-runs are done), or when --max-runs or the
+# --budget in seconds would be exceeded. Stable benchmarks stop early, noisy ones get more runs.
+#
+#   cd python-extension/script
+#   python ../timer/runner.py --target 0.02 --budget 600 -- pypy -OO n-body.py 50000000
+#   python ../timer/runner.py --stdin fasta25000000.txt -- python -OO k-nucleotide.py 0
+#
+# With --manifest it runs the whole suite described in manifest.json instead: every benchmark
+# on every interpreter, with stdin inputs generated once into a content-addressed cache.
+#
+#   python python-extension/timer/runner.py --manifest python-extension/manifest.json
+#   python python-extension/timer/runner.py --manifest python-extension/manifest.json \
+#       --interpreters pypy --benchmarks n-body k-nucleotide --adaptive
+#
+# Benchmarks marked "single_core" in the manifest run side by side, each pinned to its own
+# physical core, while the multi-process ones run alone afterwards so nothing competes for their
+# cores. --jobs limits how many single-core jobs run at once, --no-schedule runs everything in turn.
+#
+# --sweep runs the benchmarks with a "sweep" entry over a geometric range of their size argument
+# instead, into result/sweep.json, and reports the scaling fits of scaling.py. --sweep workers
+# runs the multi-process benchmarks with 1..--max-workers workers (BENCH_WORKERS) into
+# result/workers.json and reports their speedup and parallel efficiency.
+#
+#   python python-extension/timer/runner.py --manifest python-extension/manifest.json --sweep
+#   python python-extension/timer/runner.py --manifest python-extension/manifest.json --sweep workers --max-workers 8
+
+import os, sys
+import time
+import json
+import hashlib
+import argparse
+import threading
+import subprocess
+
+import scaling
+import robust_stats
+import timer_embedded
+
+extension_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+script_dir = os.path.join(extension_dir, 'script')
+input_cache_dir = os.environ.get('BENCH_INPUT_CACHE', os.path.join(extension_dir, '.cache', 'inputs'))
+
+def collect_times(run_id, phase='cold'):
+    times = []
+    for path in timer_embedded.list_shards():
+        if f'-{run_id}-' not in os.path.basename(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            sample = json.loads(f.read())['sample']
+        times.append(sample.get('warm_time', sample['time']) if phase == 'warm' else sample['time'])
+    return times
+
+def run_adaptive(command, target=0.02, budget=600.0, min_runs=3, max_runs=30,
+                 estimator='median', phase='cold', stdin=None, stdout=None, cwd=None, env=None):
+    # thread id too, concurrent jobs of one runner must not read each other's shards
+    run_id = f'runner{os.getpid()}x{threading.get_ident()}x{time.time_ns()}'
+    env = dict(os.environ, **(env or {}), TIMER_RUN_ID=run_id)
+    started = time.perf_counter()
+    while True:
+        run_start = time.perf_counter()
+        with open(stdin or os.devnull, 'rb') as fin, open(stdout or os.devnull, 'wb') as fout:
+            subprocess.run(command, env=env, stdin=fin, stdout=fout, cwd=cwd, check=True)
+        last_run = time.perf_counter() - run_start
+        elapsed = time.perf_counter() - started
+
+        times = collect_times(run_id, phase)
+        summary = robust_stats.summarize(times, estimator)
+        print(f"run {len(times)}: {summary['estimate']:.4f}s "
+              f"[{summary['ci_low']:.4f}, {summary['ci_high']:.4f}] "
+              f"+-{summary['relative_half_width']:.2%}, {summary['rejected']} rejected")
+
+        if len(times) >= min_runs and summary['relative_half_width'] <= target:
+            summary['stopped'] = 'converged'
+        elif len(times) >= max_runs:
+            summary['stopped'] = 'max runs'
+        elif elapsed + last_run > budget:
+            # another run would not fit in the budget
+            summary['stopped'] = 'budget'
+        else:
+            continue
+        summary['elapsed'] = round(elapsed, 3)
+        return summary
+
+def interpreter_spec(entry):
+    # Manifest interpreters are a command, or {"command": [...], "env": {...}} when they need
+    # environment variables, e.g. BENCH_BACKEND=thread
+    if isinstance(entry, list):
+        return entry, {}
+    return entry['command'], entry.get('env', {})
+
+def input_key(spec):
+    # Generated inputs only depend on the generator's source, its arguments and the manifest's
+    # version number, not on the interpreter producing them or on the run
+    with open(os.path.join(script_dir, spec['script']), 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source)
+    digest.update(json.dumps([spec['args'], spec.get('version', 0)]).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def ensure_input(name, spec, interpreters):
+    # Path of the cached input, generated first if this key was never built
+    path = os.path.join(input_cache_dir, f'{name}-{input_key(spec)}.txt')
+    if os.path.exists(path):
+        print(f"Input {name}: cached")
+        return path
+    os.makedirs(input_cache_dir, exist_ok=True)
+    print(f"Input {name}: generating")
+    command, env = interpreter_spec(interpreters[spec['interpreter']])
+    with open(f'{path}.tmp', 'wb') as f:
+        subprocess.run(command + [spec['script']] + spec['args'], env=dict(os.environ, **env),
+                       stdout=f, cwd=script_dir, check=True)
+    os.replace(f'{path}.tmp', path)
+    # Entries of older keys for the same input are never read again
+    for other in os.listdir(input_cache_dir):
+        if other.startswith(f'{name}-') and other.endswith('.txt') and other != os.path.basename(path):
+            os.remove(os.path.join(input_cache_dir, other))
+    return path
+
+def physical_cpus():
+    # The CPUs this process may use, one per physical core: SMT siblings share execution units,
+    # so two jobs on one core would slow each other down
+    cpus, seen = [], set()
+    for cpu in sorted(os.sched_getaffinity(0)):
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list', 'r') as f:
+                siblings = f.read().strip()
+        except OSError:
+            siblings = str(cpu)
+        if siblings not in seen:
+            seen.add(siblings)
+            cpus.append(cpu)
+    return cpus
+
+def sweep_sizes(spec):
+    # `points` sizes from `min` to `max` with a constant ratio, rounded to integers
+    low, high, points = spec['min'], spec['max'], spec.get('points', 5)
+    sizes = [round(low * (high / low) ** (i / max(1, points - 1))) for i in range(points)]
+    return sorted(set(sizes))
+
+def size_variants(benchmark, max_workers):
+    # sweep samples go to their own store, tagged with the size they were taken at
+    spec = benchmark['sweep']
+    position = spec.get('arg', 0)
+    return [
+        (benchmark['args'][:position] + [str(size)] + benchmark['args'][position + 1:],
+         {'TIMER_STORE': 'sweep', 'TIMER_SIZE': str(size)})
+        for size in sweep_sizes(spec)
+    ]
+
+def worker_variants(benchmark, max_workers):
+    # with 1 worker every script runs in-process without a pool or worker process, which makes it
+    # the serial baseline speedup and efficiency are measured against
+    return [
+        (benchmark['args'], {'TIMER_STORE': 'workers', 'BENCH_WORKERS': str(workers)})
+        for workers in range(1, max_workers + 1)
+    ]
+
+# sweep -> (variants of a benchmark, benchmarks it applies to, store)
+sweep_map = {
+    'size': (size_variants, lambda x: 'sweep' in x, 'sweep'),
+    'workers': (worker_variants, lambda x: not x.get('single_core'), 'workers'),
+}
+
+def run_job(command, stdin, runs, env, adaptive, adaptive_options):
+    print(f"Running {' '.join(command)}")
+    if adaptive:
+        run_adaptive(command, stdin=stdin, cwd=script_dir, env=env, **adaptive_options)
+    else:
+        env = dict(os.environ, **env)
+        for _ in range(runs):
+            with open(stdin or os.devnull, 'rb') as fin, open(os.devnull, 'wb') as fout:
+                subprocess.run(command, env=env, stdin=fin, stdout=fout, cwd=script_dir, check=True)
+
+def run_pinned(jobs, cpus, adaptive, adaptive_options):
+    # One worker thread per CPU. On Linux the affinity set with pid 0 is the calling thread's,
+    # and the benchmark processes it starts inherit it, so no preexec_fn (unsafe with threads) is needed
+    pending = list(reversed(jobs))
+    lock = threading.Lock()
+    errors = []
+
+    def worker(cpu):
+        os.sched_setaffinity(0, {cpu})
+        while not errors:
+            with lock:
+                if not pending:
+                    return
+                job = pending.pop()
+            try:
+                run_job(*job, adaptive, adaptive_options)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(cpu,)) for cpu in cpus]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def run_manifest(manifest, interpreters=None, benchmarks=None, adaptive=False,
+                 jobs=None, schedule=True, sweep=None, max_workers=None, **adaptive_options):
+    interpreter_commands = manifest['interpreters']
+    interpreters = interpreters or list(interpreter_commands)
+    selected = [
+        x for x in manifest['benchmarks']
+        if (not benchmarks or os.path.splitext(x['script'])[0] in benchmarks)
+        and (not sweep or sweep_map[sweep][1](x))
+    ]
+    single_core, exclusive = [], []
+    for benchmark in selected:
+        stdin = None
+        if 'stdin' in benchmark:
+            stdin = ensure_input(benchmark['stdin'], manifest['inputs'][benchmark['stdin']], interpreter_commands)
+        variants = [(benchmark['args'], {})]
+        if sweep:
+            variants = sweep_map[sweep][0](benchmark, max_workers or len(os.sched_getaffinity(0)))
+        for interpreter in interpreters:
+            interpreter_command, interpreter_env = interpreter_spec(interpreter_commands[interpreter])
+            for args, env in variants:
+                command = interpreter_command + [benchmark['script']] + args
+                job = (command, stdin, benchmark.get('runs', 1), {**interpreter_env, **env})
+                (single_core if benchmark.get('single_core') else exclusive).append(job)
+
+    cpus = physical_cpus()[:jobs] if schedule and hasattr(os, 'sched_setaffinity') else []
+    if len(cpus) > 1:
+        print(f"Running {len(single_core)} single-core jobs on CPUs {', '.join(map(str, cpus))}")
+        run_pinned(single_core, cpus, adaptive, adaptive_options)
+    else:
+        exclusive = single_core + exclusive
+    # multi-process benchmarks get the whole machine, one at a time
+    for job in exclusive:
+        run_job(*job, adaptive, adaptive_options)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="%(prog)s [options] -- command ...\n       %(prog)s --manifest manifest.json [options]")
+    parser.add_argument('--target', type=float, default=0.02, help="relative CI half-width to stop at")
+    parser.add_argument('--budget', type=float, default=600.0, help="seconds to spend at most")
+    parser.add_argument('--min-runs', type=int, default=3)
+    parser.add_argument('--max-runs', type=int, default=30)
+    parser.add_argument('--estimator', choices=sorted(robust_stats.estimator_map), default='median')
+    parser.add_argument('--phase', choices=('cold', 'warm'), default='cold')
+    parser.add_argument('--stdin', help="file fed to every run")
+    parser.add_argument('--stdout', help="file every run writes to, discarded by default")
+    parser.add_argument('--manifest', help="run the suite described in this manifest")
+    parser.add_argument('--interpreters', nargs='+', help="manifest interpreters to run, all by default")
+    parser.add_argument('--benchmarks', nargs='+', help="manifest benchmarks to run (script names without .py), all by default")
+    parser.add_argument('--adaptive', action='store_true', help="repeat every manifest benchmark until --target or --budget")
+    parser.add_argument('--jobs', type=int, help="single-core manifest benchmarks to run at once, one per physical core by default")
+    parser.add_argument('--sweep', nargs='?', const='size', choices=sorted(sweep_map), help="run the manifest benchmarks over their size range (default) or 1..--max-workers workers and report how they scale")
+    parser.add_argument('--max-workers', type=int, help="largest worker count of --sweep workers, the usable CPUs by default")
+    parser.add_argument('--no-schedule', dest='schedule', action='store_false', help="run every manifest benchmark in turn")
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.manifest:
+        if args.sweep and args.adaptive:
+            parser.error("--sweep runs every point a fixed number of times, it can't be combined with --adaptive")
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            manifest = json.loads(f.read())
+        run_manifest(
+            manifest, args.interpreters, args.benchmarks, args.adaptive, args.jobs, args.schedule, args.sweep, args.max_workers,
+            target=args.target, budget=args.budget, min_runs=args.min_runs, max_runs=args.max_runs,
+            estimator=args.estimator, phase=args.phase
+        )
+        if args.sweep:
+            store = sweep_map[args.sweep][2]
+            timer_embedded.merge_shards(store)
+            analysis, text_report = scaling.report_map[store]
+            print(text_report(analysis(scaling.load(store))))
+        sys.exit(0)
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error("no benchmark command given")
+
+    summary = run_adaptive(
+        command, args.target, args.budget, args.min_runs, args.max_runs,
+        args.estimator, args.phase, args.stdin, args.stdout
+    )
+    print(json.dumps(summary))
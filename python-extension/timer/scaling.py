@@ -0,0 +1,155 @@
+# Fits how the running time and peak memory of a benchmark grow with its size argument, from
+# the samples of a size sweep (result/sweep.json, see `runner.py --sweep`), and finds the sizes
+# at which one interpreter overtakes another. For a worker sweep (result/workers.json, see
+# `runner.py --sweep workers`) it reports speedup and parallel efficiency instead.
+#
+#   python scaling.py
+#   python scaling.py --store workers --json
+
+import math
+import json
+import argparse
+import itertools
+
+import robust_stats
+import timer_embedded
+
+def fit_power_law(sizes, values):
+    # Least squares line through (log size, log value), i.e. value = scale * size ** exponent.
+    # r2 tells how well a single power law describes the points, a fixed startup cost shows up
+    # as a bend at the small sizes.
+    xs = [math.log(x) for x in sizes]
+    ys = [math.log(y) for y in values]
+    mx, my = robust_stats.mean(xs), robust_stats.mean(ys)
+    sxx = sum((x - mx) ** 2 for x in xs)
+    exponent = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+    intercept = my - exponent * mx
+    ss_res = sum((y - intercept - exponent * x) ** 2 for x, y in zip(xs, ys))
+    ss_tot = sum((y - my) ** 2 for y in ys)
+    return {
+        'scale': math.exp(intercept),
+        'exponent': exponent,
+        'r2': 1 - ss_res / ss_tot if ss_tot else 1.0,
+    }
+
+def crossover(a, b):
+    # Size at which two fitted curves meet, None when they never do
+    if abs(a['exponent'] - b['exponent']) < 1e-9:
+        return None
+    return (b['scale'] / a['scale']) ** (1 / (a['exponent'] - b['exponent']))
+
+def sweep_points(samples, key, axis='size'):
+    # (point, median of `key`) for every swept point, samples of regular runs have no `axis`
+    by_point = {}
+    for sample in samples:
+        if axis in sample and sample.get(key):
+            by_point.setdefault(sample[axis], []).append(sample[key])
+    return sorted((point, robust_stats.median(values)) for point, values in by_point.items())
+
+metric_map = {
+    'time': 'time',
+    'memory': 'peak_uss',
+}
+
+def analyze(results):
+    # script -> {'fits': {executor: {metric: fit}}, 'crossovers': [...]}
+    report = {}
+    for executor, entry in sorted(results.items()):
+        for script, samples in entry['items'].items():
+            fits = report.setdefault(script, {'fits': {}, 'crossovers': []})['fits']
+            for metric, key in metric_map.items():
+                points = sweep_points(samples, key)
+                if len(points) < 2:
+                    continue
+                sizes, values = zip(*points)
+                fits.setdefault(executor, {})[metric] = {
+                    **fit_power_law(sizes, values),
+                    'sizes': [sizes[0], sizes[-1]],
+                }
+
+    for item in report.values():
+        timed = [(executor, x['time']) for executor, x in item['fits'].items() if 'time' in x]
+        for (a, fit_a), (b, fit_b) in itertools.combinations(timed, 2):
+            size = crossover(fit_a, fit_b)
+            if size is None:
+                continue
+            # above the crossover the flatter curve is the faster one
+            faster, slower = (a, b) if fit_a['exponent'] < fit_b['exponent'] else (b, a)
+            low = max(fit_a['sizes'][0], fit_b['sizes'][0])
+            high = min(fit_a['sizes'][1], fit_b['sizes'][1])
+            item['crossovers'].append({
+                'faster_above': faster,
+                'slower_above': slower,
+                'size': size,
+                'in_range': low <= size <= high,
+            })
+    return report
+
+def format_report(report):
+    lines = []
+    for script, item in sorted(report.items()):
+        if not item['fits']:
+            continue
+        lines.append(script)
+        for executor, fits in item['fits'].items():
+            parts = [
+                f"{metric} ~ n^{fit['exponent']:.2f} (r2 {fit['r2']:.3f})"
+                for metric, fit in fits.items()
+            ]
+            sizes = next(iter(fits.values()))['sizes']
+            lines.append(f"  {executor}: {', '.join(parts)}, n = {sizes[0]}..{sizes[1]}")
+        for x in item['crossovers']:
+            where = 'within the swept sizes' if x['in_range'] else 'extrapolated'
+            lines.append(f"  {x['faster_above']} overtakes {x['slower_above']} above n = {x['size']:.4g} ({where})")
+    return '\n'.join(lines)
+
+def analyze_workers(results):
+    # script -> {executor: [{'workers', 'time', 'speedup', 'efficiency'}]}, relative to 1 worker
+    report = {}
+    for executor, entry in sorted(results.items()):
+        for script, samples in entry['items'].items():
+            points = dict(sweep_points(samples, 'time', 'workers'))
+            if 1 not in points:
+                continue
+            report.setdefault(script, {})[executor] = [
+                {
+                    'workers': workers,
+                    'time': seconds,
+                    'speedup': points[1] / seconds,
+                    'efficiency': points[1] / seconds / workers,
+                }
+                for workers, seconds in sorted(points.items())
+            ]
+    return report
+
+def format_workers_report(report):
+    lines = []
+    for script, executors in sorted(report.items()):
+        lines.append(script)
+        for executor, points in executors.items():
+            lines.append(f"  {executor}")
+            lines.extend(
+                f"    {x['workers']:>3} workers {x['time']:9.3f}s {x['speedup']:6.2f}x {x['efficiency']:6.0%}"
+                for x in points
+            )
+    return '\n'.join(lines)
+
+# store -> (analysis, text report)
+report_map = {
+    'sweep': (analyze, format_report),
+    'workers': (analyze_workers, format_workers_report),
+}
+
+def load(name='sweep'):
+    with open(timer_embedded.store_paths(name)[0], 'r', encoding='utf-8') as f:
+        return json.loads(f.read())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', choices=sorted(report_map), default='sweep', help="store holding the sweep samples")
+    parser.add_argument('--json', action='store_true', help="print the fits as JSON")
+    args = parser.parse_args()
+
+    analysis, text_report = report_map[args.store]
+    report = analysis(load(args.store))
+    print(json.dumps(report, indent=2) if args.json else text_report(report))
@@ -0,0 +1,12 @@
+# python -m pytest python-extension/timer
+
+from timer_embedded import steady_state_start
+
+def test_steady_state_start():
+    assert steady_state_start([5, 1, 1]) == 1
+    assert steady_state_start([5, 5, 5, 1, 1]) == 3
+    assert steady_state_start([5, 4, 1, 1, 1, 1]) == 2
+    # a lone slow iteration after warmup does not restart it
+    assert steady_state_start([5, 1, 1, 3, 1, 1]) == 1
+    assert steady_state_start([1, 1, 1]) == 0
+    assert steady_state_start([2]) == 0
@@ -2,45 +2,299 @@ import os, sys
 import time
 import json
 import datetime
+import sysconfig
+import threading
+import contextlib
 import psutil
 
+result_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'result')
+store = os.environ.get('TIMER_STORE', 'result')  # result.json, or e.g. sweep.json for size sweeps
+
+def store_paths(name):
+    # (merged file, shard directory) of a store
+    shards = 'shards' if name == 'result' else f'shards-{name}'
+    return os.path.join(result_dir, f'{name}.json'), os.path.join(result_dir, shards)
+
+result_path, shard_dir = store_paths(store)
+max_samples = 100   # per executor and script, older samples roll over
+sample_interval = float(os.environ.get('TIMER_SAMPLE_INTERVAL', 0.1))  # seconds, 0 turns the sampler off
+timeline_points = 20  # memory timeline kept per sample, only the latest sample of a test keeps it
+iterations = int(os.environ.get('TIMER_ITERATIONS', 1))  # runs per process in timeit.measure
+steady_tolerance = 0.05  # how close to the settled running time an iteration must be to count as warm
+workers = int(os.environ.get('BENCH_WORKERS', 0))  # processes of the parallel benchmarks, 0 for one per CPU
+backend = os.environ.get('BENCH_BACKEND', 'process')  # what the parallel benchmarks run their workers on
+free_threaded = bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+
+# Timed scripts bind Pool and Process from here, with BENCH_BACKEND=thread they get thread pools
+# and threads that share the interpreter's memory instead of forking and pickling
+if backend == 'thread':
+    from multiprocessing.pool import ThreadPool as Pool
+    from threading import Thread as Process
+elif backend == 'process':
+    from multiprocessing import Pool, Process
+else:
+    raise ValueError(f"BENCH_BACKEND must be 'process' or 'thread', not {backend!r}")
+
+def steady_state_start(times):
+    # Index of the first iteration from which on every 3 consecutive iterations have a median
+    # within `steady_tolerance` of the median of the second half, i.e. where JIT warmup is over.
+    # Taking the median of 3 lets a lone outlier such as a GC pause through. The last two
+    # iterations have shorter windows, of which the lower median is taken.
+    if len(times) < 3:
+        return len(times) - 1
+    settled = sorted(times[len(times) // 2:])[(len(times) - len(times) // 2) // 2]
+    limit = settled * (1 + steady_tolerance)
+    start = len(times) - 1
+    for i in range(len(times) - 1, -1, -1):
+        window = sorted(times[i:i + 3])
+        if window[(len(window) - 1) // 2] > limit:
+            break
+        if times[i] <= limit:
+            start = i
+    return start
+
+def cpu_count():
+    # What the parallel benchmarks size their pools by, timed scripts bind it in place of
+    # os.cpu_count so the harness can set the worker count with BENCH_WORKERS
+    return workers or os.cpu_count()
+
+def executor_name():
+    # Free-threaded CPython is its own executor whatever its binary is called, and so are runs on
+    # the thread backend, e.g. python3.13t-thread next to python
+    name = os.path.splitext(os.path.basename(sys.executable))[0]
+    if free_threaded:
+        name = f'python{sys.version_info.major}.{sys.version_info.minor}t'
+    return f'{name}-thread' if backend == 'thread' else name
+
+def write_atomic(path, content):
+    # Readers only ever see the old or the new file, never a partial one
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(f'{path}.tmp', path)
+
+class ProcessTreeSampler(threading.Thread):
+    # Polls the memory of the benchmark process and all its descendants (multiprocessing
+    # workers included) in the background. Peaks between two polls are not seen.
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.points = []        # (seconds since start, uss, rss) of the whole tree
+        self.child_cpu = {}     # pid -> latest (user, system) seen for every descendant
+        self.start_cpu = self.root.cpu_times()
+
+    def sample(self):
+        uss = rss = 0
+        for process in [self.root] + self.root.children(recursive=True):
+            try:
+                with process.oneshot():
+                    info = process.memory_full_info()
+                    if process.pid != self.root.pid:
+                        cpu = process.cpu_times()
+                        self.child_cpu[process.pid] = (cpu.user, cpu.system)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            uss += info.uss
+            rss += info.rss
+        self.points.append((time.perf_counter() - self.started, uss, rss))
+
+    def run(self):
+        self.started = time.perf_counter()
+        self.sample()
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        cpu = self.root.cpu_times()
+        # Reaped children are in children_user / children_system, the rest is counted from the
+        # latest poll of every descendant still alive
+        alive = {x.pid for x in self.root.children(recursive=True)}
+        user = cpu.user + cpu.children_user - self.start_cpu.user - self.start_cpu.children_user
+        system = cpu.system + cpu.children_system - self.start_cpu.system - self.start_cpu.children_system
+        for pid, (child_user, child_system) in self.child_cpu.items():
+            if pid in alive:
+                user += child_user
+                system += child_system
+
+        # Each poll stands for the time until the next one
+        points = self.points
+        durations = [b[0] - a[0] for a, b in zip(points, points[1:])] or [1]
+        total = sum(durations) or 1
+        # Downsample by keeping the highest point of every bucket so the peak survives
+        bucket = max(1, -(-len(points) // timeline_points))
+        timeline = [
+            max(points[i:i + bucket], key=lambda x: x[1])
+            for i in range(0, len(points), bucket)
+        ]
+        return {
+            'peak_uss': max(x[1] for x in points),
+            'peak_rss': max(x[2] for x in points),
+            'mean_uss': int(sum(x[1] * d for x, d in zip(points, durations)) / total),
+            'mean_rss': int(sum(x[2] * d for x, d in zip(points, durations)) / total),
+            'cpu_user': round(user, 3),
+            'cpu_sys': round(system, 3),
+            'timeline': [[round(t, 3), uss, rss] for t, uss, rss in timeline],
+        }
+
+_active = None  # the timeit currently running, phase() reports to it
+
+@contextlib.contextmanager
+def phase(name):
+    # Times a named part of the benchmark, e.g. `with phase("read"):`, on the running timeit.
+    # Scripts bind `phase` to contextlib.nullcontext when they run without the timer.
+    if _active is None:
+        yield
+    else:
+        with _active.phase(name):
+            yield
+
 class timeit():
 
     def __init__(self):
         get_pure = lambda x: os.path.splitext(os.path.basename(x))[0]
         self.script_name = get_pure(sys.argv[0])
-        self.executor_name = get_pure(sys.executable)
+        self.executor_name = executor_name()
         self.start_time = 0
         self.end_time = 0
+        self.sampler = None
+        self.iteration_times = []
+        self.phases = {}
 
     def __enter__(self):
-        self.start_time = time.time_ns()
+        global _active
+        if sample_interval > 0:
+            self.sampler = ProcessTreeSampler(os.getpid(), sample_interval)
+            self.sampler.start()
+        _active = self
+        self.start_time = time.perf_counter_ns()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.end_time = time.time_ns()
+        global _active
+        self.end_time = time.perf_counter_ns()
+        _active = None
+        stats = self.sampler.stop() if self.sampler else {}
         if exc_val:
             raise exc_val
         result_time = (self.end_time - self.start_time) / 1e9
-        self.update_results(result_time)
+        if self.phases:
+            stats = {**stats, 'phases': {name: round(ns / 1e9, 6) for name, ns in self.phases.items()}}
+        if len(self.iteration_times) > 1:
+            # Repeat mode: `time` stays the cold first run so the history remains comparable
+            times = self.iteration_times
+            start = steady_state_start(times)
+            warm = sorted(times[start:])
+            result_time = times[0]
+            stats = {
+                **stats,
+                'warm_time': warm[len(warm) // 2],
+                'iterations': len(times),
+                'warmup_iterations': start,
+                'iteration_times': [round(x, 6) for x in times],
+            }
+        self.update_results(result_time, stats)
 
-    def update_results(self, result_time):
-        with open('../result/result.json','r',encoding='utf-8') as f:
-            prev_results = json.loads(f.read())
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Durations of phases entered more than once add up. In repeat mode only the first,
+        # cold, iteration is recorded so the phases add up to `time`.
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            if not self.iteration_times:
+                self.phases[name] = self.phases.get(name, 0) + time.perf_counter_ns() - start
+
+    def measure(self, func, *args, repeat=None):
+        # Run func(*args) `repeat` times (TIMER_ITERATIONS by default) in this process and
+        # record every iteration, so JIT interpreters get a warm figure next to the cold one
+        self.iteration_times = []
+        with self:
+            for _ in range(repeat or iterations):
+                start = time.perf_counter_ns()
+                result = func(*args)
+                self.iteration_times.append((time.perf_counter_ns() - start) / 1e9)
+        return result
 
-        item_pointer = prev_results.setdefault(self.executor_name, {
+    def update_results(self, result_time, stats=None):
+        # Every sample goes to its own shard file instead of rewriting result.json, so runs in
+        # parallel never overwrite each other and a write costs the same however long the
+        # history is. `python timer_embedded.py merge` folds the shards into result.json.
+        os.makedirs(shard_dir, exist_ok=True)
+        run_id = os.environ.get('TIMER_RUN_ID', 'local')
+        ns = time.time_ns()
+        shard = {
             'executor_name': self.executor_name,
+            'script_name': self.script_name,
+            'ns': ns,
+            'sample': {
+                'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'time': result_time,
+                # USS of this process at exit, as it has always been recorded
+                'mem': psutil.Process(os.getpid()).memory_full_info().uss,
+                **(stats or {})
+            }
+        }
+        if 'TIMER_SIZE' in os.environ:
+            # size argument of a sweep point
+            shard['sample']['size'] = int(os.environ['TIMER_SIZE'])
+        if workers:
+            shard['sample']['workers'] = workers
+        if free_threaded:
+            # an extension module without free-threading support turns the GIL back on
+            shard['sample']['gil'] = sys._is_gil_enabled()
+        name = f'{self.executor_name}-{self.script_name}-{run_id}-{os.getpid()}-{ns}.json'
+        write_atomic(os.path.join(shard_dir, name), json.dumps(shard))
+
+def list_shards(name=store):
+    directory = store_paths(name)[1]
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, x) for x in os.listdir(directory) if x.endswith('.json')]
+
+def merge_shards(name=store):
+    # Compaction: append every shard to the store's file (result.json) in the order the samples
+    # were taken, then remove the merged shards. Shards written while this runs are left for the
+    # next merge.
+    shards = []
+    path, _ = store_paths(name)
+    for shard_path in list_shards(name):
+        with open(shard_path, 'r', encoding='utf-8') as f:
+            shards.append((json.loads(f.read()), shard_path))
+    if not shards:
+        return 0
+    shards.sort(key=lambda x: (x[0]['ns'], x[1]))
+
+    prev_results = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            prev_results = json.loads(f.read())
+    for shard, _ in shards:
+        item_pointer = prev_results.setdefault(shard['executor_name'], {
+            'executor_name': shard['executor_name'],
             'version': 'Reserved',
             'items': {}
         })
-        item_pointer = item_pointer['items']
-        current_test_item_list = item_pointer.setdefault(self.script_name, [])
-        current_test_item_list.append({
-            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'time': result_time,
-            'mem': psutil.Process(os.getpid()).memory_full_info().uss
-        })
-        while len(current_test_item_list) > 100:
-            current_test_item_list.pop(0)
+        current_test_item_list = item_pointer['items'].setdefault(shard['script_name'], [])
+        for previous in current_test_item_list:
+            previous.pop('timeline', None)
+        current_test_item_list.append(shard['sample'])
+        del current_test_item_list[:-max_samples]
+
+    write_atomic(path, json.dumps(prev_results, indent=2))
+    for _, shard_path in shards:
+        os.remove(shard_path)
+    return len(shards)
 
-        with open('../result/result.json','w',encoding='utf-8') as f:
-            f.write(json.dumps(prev_results, indent=2))
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['merge'] and len(sys.argv) <= 3:
+        name = sys.argv[2] if len(sys.argv) == 3 else store
+        print(f"Merged {merge_shards(name)} samples into {os.path.normpath(store_paths(name)[0])}")
+    else:
+        print("usage: python timer_embedded.py merge [store]")
+        sys.exit(1)
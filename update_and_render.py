@@ -1,3 +1,4 @@
+from __future__ import annotations
 import os
 import re
 import sys
@@ -6,37 +7,234 @@ import json
 import math
 import datetime
 import base64
-import pandas as pd
-import requests
-from PIL import Image
-from PIL.PngImagePlugin import PngImageFile
-from bs4 import BeautifulSoup
+import random
+import hashlib
+import argparse
+import subprocess
 from pipeit import *
-from typing import List, Set, Dict
+from typing import List, Set, Dict, Tuple, TYPE_CHECKING
 from io import BytesIO
-from selenium import webdriver
+
+# numpy, pandas, requests, PIL, bs4, lxml and selenium are imported by the functions using them,
+# so every subcommand only pays for its own dependencies (see subcommand_modules)
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    import requests
+    from PIL import Image
 
 # pd.set_option('display.max_rows',None)
 # pd.set_option('display.max_columns',None)
 # pd.set_option('display.width',1000)
 constant_L = 10
 
-def reliable_fetch(url):
-    loopnum = 0
-    while loopnum < 3:
-        loopnum += 1
-        data = requests.get(url)
-        if data.status_code == 200 and '<!DOCTYPE html>' in data.text:
-            break
-        time.sleep(5)
+local_result_path = './python-extension/result/result.json'
+template_path = './renderlogic_template.js'
+renderlogic_path = './docs/renderlogic.js'
+index_path = './docs/index.html'
+image_path = './ranking.png'
+data_path = './docs/ranking.json'
+data_url = 'ranking.json'  # relative to index.html
+
+benchmarks_game_uri = 'https://benchmarksgame-team.pages.debian.net/benchmarksgame/'
+fetch_concurrency = 8
+fetch_retries = 3
+fetch_backoff = 1.0  # seconds, doubled for every failed attempt
+
+_session = None
+
+def get_session() -> requests.Session:
+    import requests
+    from requests.adapters import HTTPAdapter
+    # One keep-alive session shared by every fetch, sized to the worker pool
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=fetch_concurrency)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+http_cache_dir = './.cache/http'
+
+def _http_cache_paths(url: str):
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(http_cache_dir, f'{key}.json'), os.path.join(http_cache_dir, f'{key}.html')
+
+def load_cached_response(url: str):
+    meta_path, body_path = _http_cache_paths(url)
+    if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+        return None, None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.loads(f.read())
+    with open(body_path, 'r', encoding='utf-8') as f:
+        return meta, f.read()
+
+def store_cached_response(url: str, response: requests.Response):
+    os.makedirs(http_cache_dir, exist_ok=True)
+    meta_path, body_path = _http_cache_paths(url)
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    # Write to temporary files first so an interrupted run never leaves half an entry
+    for path, content in ((body_path, response.text), (meta_path, json.dumps(meta))):
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(f'{path}.tmp', path)
+
+def reliable_fetch(url, session: requests.Session = None, offline: bool = False):
+    import requests
+    meta, cached_body = load_cached_response(url)
+    if offline:
+        if cached_body is None:
+            raise AssertionError(f"No cached copy for offline mode, url: {url}")
+        return cached_body
+
+    # Revalidate the cached copy with a conditional GET, the server answers 304 if unchanged
+    headers = {}
+    if cached_body is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    session = session or get_session()
+    for loopnum in range(fetch_retries):
+        try:
+            data = session.get(url, headers=headers, timeout=30)
+            if data.status_code == 304 and cached_body is not None:
+                return cached_body
+            if data.status_code == 200 and '<!DOCTYPE html>' in data.text:
+                break
+        except requests.RequestException:
+            pass
+        if loopnum < fetch_retries - 1:
+            # Jittered exponential backoff so concurrent workers don't retry in lockstep
+            time.sleep(fetch_backoff * 2 ** loopnum * random.uniform(0.5, 1.5))
     else:
         raise AssertionError(f"Fetching data error, url: {url}")
+    store_cached_response(url, data)
     return data.text
 
-def get_test_results_from_website():
-    uri = 'https://benchmarksgame-team.pages.debian.net/benchmarksgame/'
+def parse_result_line(tag_name: str, current_test_name: str, line_text: str, cell_texts: List[str]):
+    # find test line but not compare line
+    scan_name = tag_name
+    # except
+    if scan_name.lower() == 'javascript':
+        scan_name = "Node"
+    if scan_name not in line_text:
+        return None
+    if len(cell_texts) != 4: #
+        return None
+        raise RuntimeError("Item line td number not equal to 4, may have some change in website.")
+    it = iter(cell_texts)
+    treat = lambda x: x.replace('\xa0',' ').replace(',','').strip()
+    try:
+        output_result_dict = {'test_name': treat(current_test_name)}
+        output_result_dict['language'] = treat(next(it))
+        re_res = re.search("#[\d]+", output_result_dict['language'])
+        if re_res:
+            output_result_dict['language'] = output_result_dict['language'][:re_res.start()].strip()
+        output_result_dict['mem'] = int(treat(next(it)))
+        output_result_dict['gz'] = int(treat(next(it)))
+        output_result_dict['secs'] = float(treat(next(it)))
+    except:
+        # Bad Output/Make Fail
+        return None
+    return output_result_dict
+
+def parse_language_page_soup(language_tested: str, tag_name: str) -> List[Dict]:
+    from bs4 import BeautifulSoup
+    soup_tested = BeautifulSoup(language_tested, "lxml").find('table')
+    this_language_result_list = []
+    for single_result in soup_tested.find_all('tbody'):
+        if len(single_result.find_all('td')):
+            # for each test
+            current_test_name = ''
+            for single_result_line in single_result.find_all('tr'):
+                try:
+                    # find test name
+                    assert single_result_line.find('th').get('colspan').isdigit()
+                    current_test_name = single_result_line.find('span').text
+                except:
+                    output_result_dict = parse_result_line(
+                        tag_name,
+                        current_test_name,
+                        single_result_line.text,
+                        single_result_line.find_all('td') | Map(lambda x: x.text) | list
+                    )
+                    if output_result_dict:
+                        this_language_result_list.append(output_result_dict)
+    return this_language_result_list
+
+def parse_language_page_stream(language_tested: str, tag_name: str) -> List[Dict]:
+    from lxml import etree
+    # Pull-parse only the first table row by row instead of building the whole document,
+    # every finished row is cleared and the parse stops as soon as that table is closed
+    text_of = lambda x: ''.join(x.itertext())
+    events = etree.iterparse(
+        BytesIO(language_tested.encode('utf-8')),
+        events=('start', 'end'),
+        tag=('table', 'tbody', 'tr'),
+        html=True,
+        encoding='utf-8'
+    )
+    this_language_result_list = []
+    table_depth = 0
+    tbody_depth = 0
+    current_test_name = ''
+    for event, element in events:
+        if element.tag == 'table':
+            table_depth += 1 if event == 'start' else -1
+            if table_depth == 0:
+                break
+        elif table_depth == 0:
+            continue
+        elif element.tag == 'tbody':
+            tbody_depth += 1 if event == 'start' else -1
+            if event == 'start':
+                current_test_name = ''
+        elif event == 'end' and tbody_depth > 0:
+            header, span = element.find('.//th'), element.find('.//span')
+            if header is not None and (header.get('colspan') or '').isdigit() and span is not None:
+                # find test name
+                current_test_name = text_of(span)
+            else:
+                output_result_dict = parse_result_line(
+                    tag_name,
+                    current_test_name,
+                    text_of(element),
+                    element.iterfind('.//td') | Map(text_of) | list
+                )
+                if output_result_dict:
+                    this_language_result_list.append(output_result_dict)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    return this_language_result_list
+
+page_parser_map = {
+    'soup': parse_language_page_soup,      # full BeautifulSoup tree, the reference implementation
+    'stream': parse_language_page_stream,  # lxml pull parser limited to the results table
+}
+
+def scrape_language_pages(
+    concurrency: int = fetch_concurrency,
+    offline: bool = False,
+    parser: str = 'stream',
+    previous: Dict[str, Tuple[str, List[Dict]]] = None,
+    uri: str = None
+) -> List[Tuple[str, str, List[Dict]]]:
+    # Returns (page name, page content hash, parsed results) for every language page,
+    # pages whose hash matches the one in `previous` reuse its results instead of being parsed again
+    from concurrent.futures import ThreadPoolExecutor
+    from bs4 import BeautifulSoup
+    uri = uri or benchmarks_game_uri
+    session = get_session()
     try:
-        data = reliable_fetch(f'{uri}/index.html')
+        data = reliable_fetch(f'{uri}/index.html', session, offline)
     except:
         raise RuntimeError("Error fetching web information.")
         sys.exit(1)
@@ -51,147 +249,325 @@ def get_test_results_from_website():
     else:
         raise RuntimeError("Didn't find target ul.")
 
-    full_language_result_list = []
+    language_pages = []
     for atag in ul.find_all('a'):
         # for each programming language
         tag_href = atag.get("href")
         tag_name = atag.text
         if './' in tag_href:
             tag_href = tag_href.replace('./', uri)
-        language_tested = reliable_fetch(tag_href)
-        soup_tested = BeautifulSoup(language_tested, "lxml").find('table')
-        this_language_result_list = []
-        for single_result in soup_tested.find_all('tbody'):
-            if len(single_result.find_all('td')):
-                # for each test
-                current_test_name = ''
-                for single_result_line in single_result.find_all('tr'):
-                    try:
-                        # find test name
-                        assert single_result_line.find('th').get('colspan').isdigit()
-                        current_test_name = single_result_line.find('span').text
-                    except:
-                        # find test line but not compare line
-                        scan_name = tag_name
-                        # except
-                        if scan_name.lower() == 'javascript':
-                            scan_name = "Node"
-                        if scan_name in single_result_line.text:
-                            it = single_result_line.find_all('td')
-                            if len(it) != 4: #
-                                continue
-                                raise RuntimeError("Item line td number not equal to 4, may have some change in website.")
-                            it = iter(it)
-                            treat = lambda x: x.replace('\xa0',' ').replace(',','').strip()
-                            try:
-                                output_result_dict = {'test_name': treat(current_test_name)}
-                                output_result_dict['language'] = treat(next(it).text)
-                                re_res = re.search("#[\d]+", output_result_dict['language'])
-                                if re_res:
-                                    output_result_dict['language'] = output_result_dict['language'][:re_res.start()].strip()
-                                output_result_dict['mem'] = int(treat(next(it).text))
-                                output_result_dict['gz'] = int(treat(next(it).text))
-                                output_result_dict['secs'] = float(treat(next(it).text))
-                                this_language_result_list.append(output_result_dict)
-                            except:
-                                # Bad Output/Make Fail
-                                continue
-        else:
-            if len(this_language_result_list) > 0:
-                full_language_result_list.append(this_language_result_list)
-    return full_language_result_list
+        language_pages.append((tag_href, tag_name))
+
+    parse_page = page_parser_map[parser]
+    previous = previous or {}
+
+    def fetch_and_parse(page):
+        tag_href, tag_name = page
+        language_tested = reliable_fetch(tag_href, session, offline)
+        page_hash = hashlib.sha256(language_tested.encode('utf-8')).hexdigest()
+        if tag_name in previous and previous[tag_name][0] == page_hash:
+            return tag_name, page_hash, previous[tag_name][1]
+        return tag_name, page_hash, parse_page(language_tested, tag_name)
+
+    # executor.map keeps the page order, so the output matches a sequential scrape
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(fetch_and_parse, language_pages))
+
+def get_test_results_from_website(
+    concurrency: int = fetch_concurrency,
+    offline: bool = False,
+    parser: str = 'stream',
+    uri: str = None
+):
+    pages = scrape_language_pages(concurrency, offline, parser, uri=uri)
+    return pages | Map(lambda x: x[2]) | Filter(lambda x: len(x) > 0) | list
 
-def get_local_extended_results():
+# Committed with the rendered files on purpose: they are the dated history of the website's
+# figures and what --incremental compares against in CI, while .cache may be evicted
+snapshot_dir = './snapshots'
+snapshot_columns = ('test_name', 'language', 'mem', 'gz', 'secs')
 
-    with open('./python-extension/result/result.json','r',encoding='utf-8') as f:
+def save_snapshot(pages: List[Tuple[str, str, List[Dict]]], date: str = None) -> str:
+    import numpy as np
+    # One compressed .npz per day, results stored column by column and keyed by page and test
+    date = date or datetime.date.today().strftime('%Y-%m-%d')
+    records = [(page_name, record) for page_name, _, results in pages for record in results]
+    columns = {
+        'page': np.array([x[0] for x in records], dtype=str),
+        'test_name': np.array([x[1]['test_name'] for x in records], dtype=str),
+        'language': np.array([x[1]['language'] for x in records], dtype=str),
+        'mem': np.array([x[1]['mem'] for x in records], dtype=np.int64),
+        'gz': np.array([x[1]['gz'] for x in records], dtype=np.int64),
+        'secs': np.array([x[1]['secs'] for x in records], dtype=np.float64),
+        'page_names': np.array([x[0] for x in pages], dtype=str),
+        'page_hashes': np.array([x[1] for x in pages], dtype=str),
+    }
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f'{date}.npz')
+    with open(f'{path}.tmp', 'wb') as f:
+        np.savez_compressed(f, **columns)
+    os.replace(f'{path}.tmp', path)
+    return path
+
+def load_snapshot(path: str) -> List[Tuple[str, str, List[Dict]]]:
+    import numpy as np
+    with np.load(path, allow_pickle=False) as data:
+        columns = {key: data[key].tolist() for key in data.files}
+    page_results = {page_name: [] for page_name in columns['page_names']}
+    for i, page_name in enumerate(columns['page']):
+        page_results[page_name].append({key: columns[key][i] for key in snapshot_columns})
+    return [
+        (page_name, page_hash, page_results[page_name])
+        for page_name, page_hash in zip(columns['page_names'], columns['page_hashes'])
+    ]
+
+def list_snapshots() -> List[str]:
+    if not os.path.isdir(snapshot_dir):
+        return []
+    # ISO dates in the file names sort chronologically
+    return sorted(os.listdir(snapshot_dir) | Filter(lambda x: x.endswith('.npz')) | Map(lambda x: os.path.join(snapshot_dir, x)))
+
+def load_latest_snapshot() -> Dict[str, Tuple[str, List[Dict]]]:
+    snapshots = list_snapshots()
+    if not snapshots:
+        return {}
+    return {page_name: (page_hash, results) for page_name, page_hash, results in load_snapshot(snapshots[-1])}
+
+def load_snapshot_history(language: str = None, test_name: str = None) -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+    # Every stored scrape as one long table, e.g. for plotting a language's times across dates
+    frames = []
+    for path in list_snapshots():
+        with np.load(path, allow_pickle=False) as data:
+            frame = pd.DataFrame({key: data[key] for key in ('page', *snapshot_columns)})
+        frame.insert(0, 'date', os.path.splitext(os.path.basename(path))[0])
+        if language is not None:
+            frame = frame[frame['language'] == language]
+        if test_name is not None:
+            frame = frame[frame['test_name'] == test_name]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['date', 'page', *snapshot_columns])
+    return pd.concat(frames, ignore_index=True)
+
+def changed_pages(pages: List[Tuple[str, str, List[Dict]]], previous: Dict[str, Tuple[str, List[Dict]]]) -> List[str]:
+    return pages | Filter(lambda x: x[0] not in previous or previous[x[0]][0] != x[1]) | Map(lambda x: x[0]) | list
+
+# Interpreters we benchmark ourselves run on a different machine than the website, so every
+# local row is rescaled by how fast the website's CPython is relative to our own CPython run
+control_executor = 'python'                # executor in result.json that serves as control
+calibration_control = "Python-control"     # its label in the frames
+calibration_reference = "Python 3"         # the website's CPython row
+local_mem_divisor = 1024                   # result.json records USS in bytes, the website reports KB
+local_sample_window = 10                   # a local result is estimated from its latest samples
+local_estimator = 'median'                 # robust_stats.estimator_map key, applied after outlier rejection
+local_timer_dir = './python-extension/timer'
+robust_stats_path = os.path.join(local_timer_dir, 'robust_stats.py')
+
+def local_executor_label(executor_name: str) -> str:
+    label = calibration_control if executor_name == control_executor else executor_name
+    return f"{label[0].upper()}{label[1:]}"
+
+# Which figure of a local sample is ranked. Repeat mode (timeit.measure) records the steady
+# state next to the cold first run, samples without one only have the cold figure.
+local_phase_map = {
+    'cold': lambda x: x["time"],
+    'warm': lambda x: x.get("warm_time", x["time"]),
+}
+
+def import_robust_stats():
+    # robust_stats lives next to the timer, where the benchmarked interpreters import it too
+    if os.path.abspath(local_timer_dir) not in sys.path:
+        sys.path.append(os.path.abspath(local_timer_dir))
+    import robust_stats
+    return robust_stats
+
+def get_local_extended_results(phase: str = 'cold'):
+    robust_stats = import_robust_stats()
+    sample_time = local_phase_map[phase]
+
+    with open(local_result_path,'r',encoding='utf-8') as f:
         raw = json.loads(f.read())
 
     # Wash the data into the specified format
     full_language_result_list = []
     for key, value in raw.items():
         # for each interpreter
-        if value['executor_name'] == 'python':
-            label = "python-control"
-        else:
-            label = value['executor_name']
-        label = f"{label[0].upper()}{label[1:]}"
+        label = local_executor_label(value['executor_name'])
         
         this_language_result_list = []
         for test_name, test_results in value["items"].items():
             # for each test
-            trimed = test_results[-10:]
+            trimed = test_results[-local_sample_window:]
             output_result_dict = {"test_name": test_name, "language": label}
-            output_result_dict["secs"] = sum(trimed | Map(lambda x: round(x["time"],2))) / len(trimed)
-            output_result_dict["mem"] = int(sum(trimed | Map(lambda x: x["mem"] )) / len(trimed) / 1024 + 0.5)
+            # Outliers from noisy runners are rejected before estimating, nothing here shows an
+            # interval so no bootstrap is run
+            secs = robust_stats.summarize(trimed | Map(lambda x: round(sample_time(x),2)) | list, local_estimator, resamples=0)
+            mem = robust_stats.summarize(trimed | Map(lambda x: x["mem"]) | list, local_estimator, resamples=0)
+            output_result_dict["secs"] = secs["estimate"]
+            output_result_dict["mem"] = int(mem["estimate"] / local_mem_divisor + 0.5)
             output_result_dict["gz"] = 0
-            output_result_dict["busy"] = 0
-            output_result_dict["cpu load"] = 0
+            # CPU seconds of the whole process tree and how many cores that kept busy on average (%),
+            # only samples recorded by the process tree sampler have them. Repeat mode samples cover
+            # all iterations, so they are brought back to one run.
+            wall = lambda x: sum(x["iteration_times"]) if "iteration_times" in x else x["time"]
+            busy = lambda x: (x["cpu_user"] + x["cpu_sys"]) / x.get("iterations", 1)
+            sampled = trimed | Filter(lambda x: "cpu_user" in x and x["time"] > 0) | list
+            output_result_dict["busy"] = round(sum(sampled | Map(busy)) / len(sampled), 2) if sampled else 0
+            output_result_dict["cpu load"] = round(sum(sampled | Map(lambda x: (x["cpu_user"] + x["cpu_sys"]) / wall(x) * 100)) / len(sampled)) if sampled else 0
             this_language_result_list.append(output_result_dict)
         else:
             full_language_result_list.append(this_language_result_list)
 
     return full_language_result_list
 
-def convert_into_pandas_dataframe(full_language_result_list: List[List[Dict]],target_key: str) -> pd.DataFrame:
-    # The repeated execution here creates logical redundancy, but given that we don't 
-    # care about efficiency and for the sake of code-reviewer's logical simplicity, 
-    # we take it in this way
-    test_items_in_summary = []
-    for programming_language_results in full_language_result_list:
-        assert len(programming_language_results) > 0
-        test_items = programming_language_results | Map(lambda x: x["test_name"]) | set
-        test_items_in_summary.append(test_items)
-    else:
-        # Take merge sets here because some languages may not pass the test on individual projects
-        test_items_in_summary = test_items_in_summary | Reduce(lambda x,y: x.union(y))
+history_path = './docs/history.json'
 
-    # If raise error here means there's no leagel items in full_language_result_list
-    assert isinstance(test_items_in_summary, set)
+def load_local_samples(phase: str = 'cold') -> pd.DataFrame:
+    # Every sample in result.json as one long table
+    import pandas as pd
+    sample_time = local_phase_map[phase]
+    with open(local_result_path, 'r', encoding='utf-8') as f:
+        raw = json.loads(f.read())
+    rows = [
+        (local_executor_label(value['executor_name']), test_name, x['date'], round(sample_time(x), 2), x['mem'])
+        for value in raw.values()
+        for test_name, test_results in value['items'].items()
+        for x in test_results
+    ]
+    return pd.DataFrame(rows, columns=['language', 'test_name', 'date', 'secs', 'mem'])
+
+def compute_speedup_history(samples: pd.DataFrame, window: int = local_sample_window) -> pd.DataFrame:
+    # Speedup of every local executor over the control run for each date a sample was taken.
+    # The value of a test at a date is the estimate of its latest `window` samples up to that
+    # date after outlier rejection, the same figure get_local_extended_results would have
+    # produced that day, computed for all dates at once with one grouped rolling window
+    # instead of re-ranking date by date. The robust estimator is Python code called once per
+    # window, pandas has no vectorised equivalent of the outlier rejection.
+    import numpy as np
+    import pandas as pd
+    robust_stats = import_robust_stats()
+    estimate = lambda xs: robust_stats.summarize(list(xs), local_estimator, resamples=0)['estimate']
+    samples = samples.sort_values(['language', 'test_name', 'date'], kind='mergesort').reset_index(drop=True)
+    rolling = samples.groupby(['language', 'test_name'])['secs'].rolling(window, min_periods=1).apply(estimate, raw=True)
+    samples['secs'] = rolling.reset_index(level=[0, 1], drop=True)
+    samples['day'] = samples['date'].str[:10]
+    # Last value of every day, carried forward until the series gets a new sample
+    latest = samples.drop_duplicates(['language', 'test_name', 'day'], keep='last')
+    table = latest.pivot(index='day', columns=['language', 'test_name'], values='secs').sort_index().ffill()
+    if calibration_control not in table.columns.get_level_values(0):
+        return pd.DataFrame(index=table.index)
+
+    control = table[calibration_control]
+    local = table.drop(columns=calibration_control, level=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.log(control.reindex(columns=local.columns.get_level_values(1)).to_numpy() / local.to_numpy())
+    log_ratio = pd.DataFrame(log_ratio, index=table.index, columns=local.columns).replace([np.inf, -np.inf], np.nan)
+    # Geometric mean over the tests each executor has a result for
+    speedup = np.exp(log_ratio.T.groupby(level=0).mean().T)
+    return speedup.dropna(how='all').round(decimals=3)
+
+def render_history_output(speedup: pd.DataFrame) -> str:
+    series = {label: [None if math.isnan(x) else x for x in speedup[label].tolist()] for label in speedup.columns}
+    # The page describes the series from these fields, so they follow local_estimator
+    method = {'window': local_sample_window, 'estimator': local_estimator.replace('_', ' '), 'outliers': 'MAD'}
+    return json.dumps({**method, 'dates': speedup.index.tolist(), 'series': series}, separators=(',', ':'))
 
-    test_items_in_summary = sorted(list(test_items_in_summary)) # Fix order
+def convert_into_pandas_dataframes(
+    full_language_result_list: List[List[Dict]],
+    target_keys: Tuple[str, ...] = ("secs", "mem")
+) -> Dict[str, pd.DataFrame]:
+    import pandas as pd
+    # Flatten every result into one record table in a single pass, then pivot all requested
+    # metrics at once. Rows are keyed by position so languages sharing a label stay apart.
     languages_in_summary = []
-    array = []
-    for programming_language_results in full_language_result_list:
-        line = [] 
-        # there's assertion above make sure non-empty
+    rows, test_names = [], []
+    values = {key: [] for key in target_keys}
+    for row, programming_language_results in enumerate(full_language_result_list):
+        assert len(programming_language_results) > 0
         languages_in_summary.append(programming_language_results[0]["language"])
+        for single_result in programming_language_results:
+            rows.append(row)
+            test_names.append(single_result["test_name"])
+            for key in target_keys:
+                values[key].append(single_result[key])
 
-        for test_name in test_items_in_summary:
-            for single_result in programming_language_results:
-                if single_result["test_name"] == test_name:
-                    line.append(single_result[target_key])
-                    break
-            else:
-                line.append(None)
-        array.append(line)
-    return pd.DataFrame(array, index=languages_in_summary, columns=test_items_in_summary, dtype=float)
+    # If raise error here means there's no leagel items in full_language_result_list
+    assert len(rows) > 0
+
+    records = pd.DataFrame({"row": rows, "test_name": test_names, **values})
+    # A language may list several variants of one test, the first one wins
+    records.drop_duplicates(subset=["row", "test_name"], keep="first", inplace=True)
+    # Take the union of test names because some languages may not pass the test on individual projects
+    test_items_in_summary = sorted(records["test_name"].unique().tolist()) # Fix order
+    pivoted = records.pivot(index="row", columns="test_name", values=list(target_keys))
+
+    frames = {}
+    for key in target_keys:
+        frame = pivoted[key].reindex(index=range(len(languages_in_summary)), columns=test_items_in_summary)
+        frames[key] = pd.DataFrame(
+            frame.to_numpy(dtype=float), index=languages_in_summary, columns=test_items_in_summary, dtype=float
+        )
+    return frames
+
+def convert_into_pandas_dataframe(full_language_result_list: List[List[Dict]], target_key: str) -> pd.DataFrame:
+    return convert_into_pandas_dataframes(full_language_result_list, (target_key, ))[target_key]
+
+# A simple algorithm to adjust the weights so that extreme values are less influential
+wdight_function_map = {
+    1: lambda x: x.std().apply(lambda x: math.e**(- math.sqrt(x) / constant_L)),  # The greater the dispersion, the smaller the weight
+    2: lambda x: x.mean().apply(lambda x: math.e**(- math.sqrt(x) / constant_L)),  # The greater the mean, the smaller the weight
+    3: lambda x: x.mean().apply(lambda x: 1),   # normal mean
+}
+
+def rank_language_frame(frame: pd.DataFrame, weight_mode: int = 1) -> pd.Series:
+    import numpy as np
+    import pandas as pd
+    # Weighted, min-normalised score of every language (row) computed with whole-array
+    # operations. Missing results (NaN) are masked out of both the mean and the weight sum.
+    # The input frame is left untouched.
+    values = frame.to_numpy(dtype=float)
+    min_line = frame.min().to_numpy(dtype=float)
+    std_weight = wdight_function_map[weight_mode](frame).to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = values * std_weight / min_line
+        # Same as x / x per cell: 1 where the scaled value is usable, NaN where it's missing, 0 or inf
+        line_mask = scaled / scaled
+        masked_weight_sum = np.nansum(std_weight * line_mask, axis=1)
+        normalised = scaled / masked_weight_sum[:, None]
+        normalised = np.ma.masked_where(np.isnan(normalised), normalised)
+    # sum / count like pandas does, MaskedArray.mean multiplies by 1 / count instead
+    result = pd.Series((normalised.sum(axis=1) / normalised.count(axis=1)).filled(np.nan), index=frame.index, dtype=float)
+    result_min = result.min()
+    return result / result_min
+
+def local_executor_labels(local_results: List[List[Dict]]) -> List[str]:
+    return local_results | Map(lambda x: x[0]["language"]) | Filter(lambda x: x != calibration_control) | list
+
+def calibrate_local_executors(frame: pd.DataFrame, local_labels: List[str]) -> pd.DataFrame:
+    # Proportional calibration of every locally measured row for different machines, as one
+    # broadcast over all local rows. The per-test ratio is in (website unit / local unit), so
+    # it also converts the local mem figures (USS / local_mem_divisor) into the website's KB.
+    frame = frame.copy()
+    if calibration_control not in frame.index:
+        return frame
+    local_labels = local_labels | Filter(lambda x: x in frame.index and x != calibration_control) | list
+    if local_labels:
+        ratio = frame.loc[calibration_reference] / frame.loc[calibration_control]
+        frame.loc[local_labels] = (frame.loc[local_labels] * ratio).round(decimals=2)
+    return frame.drop(calibration_control)
 
 def compute_language_ordered_value(
     frame: pd.DataFrame,
-    weight_mode: int = 1
+    weight_mode: int = 1,
+    local_labels: List[str] = ("Pypy", "Pyston")
 ) -> pd.Series :
-    # Proportional calibration of execution times for different machines
-    frame.loc["Pypy"] = (frame.loc["Pypy"] * frame.loc["Python 3"] / frame.loc["Python-control"]).round(decimals=2)
-    frame.loc["Pyston"] = (frame.loc["Pyston"] * frame.loc["Python 3"] / frame.loc["Python-control"]).round(decimals=2)
-    frame.drop("Python-control", inplace = True)
-    # A simple algorithm to adjust the weights so that extreme values are less influential
-    min_line = frame.min()
-    wdight_function_map = {
-        1: lambda x: x.std().apply(lambda x: math.e**(- math.sqrt(x) / constant_L)),  # The greater the dispersion, the smaller the weight
-        2: lambda x: x.mean().apply(lambda x: math.e**(- math.sqrt(x) / constant_L)),  # The greater the mean, the smaller the weight
-        3: lambda x: x.mean().apply(lambda x: 1),   # normal mean
-    }
-    std_weight = wdight_function_map[weight_mode](frame)
-    for language in frame.index:
-        frame.loc[language] = frame.loc[language] * std_weight / min_line
-        line_mask = frame.loc[language].apply(lambda x: x / x)
-        masked_weight_sum = (std_weight * line_mask).sum()
-        frame.loc[language] = frame.loc[language] / masked_weight_sum
-    result = frame.mean(axis = 1)
-    result_min = result.min()
-    return result / result_min
+    return rank_language_frame(calibrate_local_executors(frame, local_labels), weight_mode)
 
 def add_weighted_index(result_secs: pd.Series, result_mem: pd.Series) -> pd.DataFrame:
+    import pandas as pd
     view = pd.concat([result_secs, result_mem], keys=('secs', 'mem'), axis=1)
     view.sort_values(by='secs', inplace=True)
     view['secs_index'] = range(1, len(view)+1)
@@ -209,15 +585,123 @@ def render_json_output(view: pd.DataFrame) -> str:
     output = zip(view.index.tolist(), view.values.tolist()) | Map(lambda x: (x[0], *x[1])) | list
     return json.dumps(output)
 
+_compiled_templates = {}
+
+def compile_template(source_name) -> List[str]:
+    # Split once on the {{key}} placeholders, literal text and keys alternate in the result
+    source_name = os.path.abspath(source_name)
+    if source_name not in _compiled_templates:
+        with open(source_name, 'r', encoding='utf-8') as f:
+            _compiled_templates[source_name] = re.split(r'\{\{(\w+)\}\}', f.read())
+    return _compiled_templates[source_name]
+
 def render(source_name, dest_name, **kwargs):
-    with open(os.path.abspath(source_name), 'r', encoding='utf-8') as f:
-        cont = f.read()
-        for key, value in kwargs.items():
-            cont = cont.replace(f"{{{{{key}}}}}", str(value))
-    with open(os.path.abspath(dest_name), 'w', encoding='utf-8') as f:
-        f.write(cont)
+    # Single pass, every piece is written out as it comes so the page is never built in memory.
+    # Unknown placeholders are kept as they are.
+    parts = compile_template(source_name)
+    dest_name = os.path.abspath(dest_name)
+    with open(f'{dest_name}.tmp', 'w', encoding='utf-8') as f:
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                f.write(part)
+            else:
+                f.write(str(kwargs[part]) if part in kwargs else f"{{{{{part}}}}}")
+    os.replace(f'{dest_name}.tmp', dest_name)
+
+def write_data_asset(output: str, render_date: str, dest_name: str = data_path):
+    # Compact json fetched by the page. GitHub Pages gzips it on the fly, a precompressed copy
+    # would never be served.
+    content = json.dumps({'render_date': render_date, 'raw_data': json.loads(output)}, separators=(',', ':'))
+    with open(f'{dest_name}.tmp', 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(f'{dest_name}.tmp', dest_name)
+
+# Every image rendered from one page load. Charts are listed back to front and composited
+# in that order, width and theme are optional overrides of the page's own setting.
+capture_selectors = ['#main2', '#main']
+capture_variants = [
+    {'name': image_path, 'pixel_ratio': 2},
+]
+
+CAPTURE_JS = """
+    const [variants, selectors, done] = arguments;
+    // Resolve on the next 'finished' event caused by `trigger`
+    const rendered = (chart, trigger) => new Promise(resolve => {
+        const handler = () => { chart.off('finished', handler); resolve(); };
+        chart.on('finished', handler);
+        trigger();
+    });
+    (async () => {
+        await window.chartsReady;
+        let charts = selectors.map(selector => echarts.getInstanceByDom(document.querySelector(selector)));
+        let theme = null;
+        const images = [];
+        for (const variant of variants) {
+            if ((variant.theme || null) !== theme) {
+                theme = variant.theme || null;
+                charts = await Promise.all(charts.map(chart => {
+                    const dom = chart.getDom(), option = chart.getOption();
+                    chart.dispose();
+                    const themed = echarts.init(dom, theme);
+                    return rendered(themed, () => themed.setOption(option)).then(() => themed);
+                }));
+            }
+            if (variant.width && charts[0].getWidth() !== variant.width) {
+                await Promise.all(charts.map(chart => rendered(chart, () => chart.resize({width: variant.width}))));
+            }
+            images.push(charts.map(chart => chart.getDataURL({
+                type: 'png',
+                pixelRatio: variant.pixel_ratio || 2,
+                excludeComponents: ['toolbox']
+            })));
+        }
+        done(images);
+    })().catch(error => done({error: String(error)}));
+"""
+
+# Output stage shared by the renderers, takes the place of `pngquant --quality 65-85 --strip`
+png_palette_sizes = (8, 16, 32, 64, 128, 256)
+png_target_psnr = 40.0    # smallest palette reaching this is used
+png_min_psnr = 32.0       # below this even with 256 colours the image stays truecolour
+png_zlib_strategies = (0, 1, 2, 3, 4)  # default, filtered, huffman only, rle, fixed
+
+def psnr(original: np.ndarray, candidate: np.ndarray) -> float:
+    import numpy as np
+    mse = np.mean((original.astype(np.float64) - candidate.astype(np.float64)) ** 2)
+    return math.inf if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def quantize_image(image: Image.Image) -> Image.Image:
+    import numpy as np
+    from PIL import Image
+    # Both renderers composite onto opaque white, so the alpha channel carries nothing
+    rgb = image.convert('RGB')
+    original = np.asarray(rgb)
+    best = None
+    for colors in png_palette_sizes:
+        candidate = rgb.quantize(colors, method=Image.MEDIANCUT, dither=Image.NONE)
+        quality = psnr(original, np.asarray(candidate.convert('RGB')))
+        if quality >= png_target_psnr:
+            return candidate
+        best = (candidate, quality)
+    return best[0] if best[1] >= png_min_psnr else rgb
+
+def encode_png(image: Image.Image) -> bytes:
+    # Try every zlib strategy at maximum compression and keep the smallest stream.
+    # No pnginfo, icc profile or dpi is passed, so no metadata chunks are written.
+    image.info = {}
+    candidates = []
+    for strategy in png_zlib_strategies:
+        buffer = BytesIO()
+        image.save(buffer, 'png', optimize=strategy == 0, compress_level=9, compress_type=strategy)
+        candidates.append(buffer.getvalue())
+    return min(candidates, key=len)
+
+def save_png(image: Image.Image, dest_name: str):
+    content = encode_png(quantize_image(image))
+    with open(dest_name, 'wb') as f:
+        f.write(content)
 
-def webkit_render_images():
+def webkit_render_images(variants: List[Dict] = None):
 
     def decode_base64(data: str) -> bytes:
         """Decode base64, padding being optional.
@@ -230,67 +714,375 @@ def webkit_render_images():
             data += "=" * (4 - missing_padding)
         return base64.decodebytes(data.encode("utf-8"))
 
+    # Selenium is only needed for this renderer
+    from selenium import webdriver
+    from PIL import Image
+
+    variants = variants or capture_variants
     # get_chrome_driver
     options = webdriver.ChromeOptions()
     options.add_argument("headless")
+    # Lets the page load docs/ranking.json over file:// when the data is not inlined
+    options.add_argument("allow-file-access-from-files")
     driver = webdriver.Chrome(options=options)
+    driver.set_script_timeout(60)
 
-    html_path = "file://" + os.path.abspath('./docs/index.html')
-    driver.get(html_path)
-    time.sleep(2)
-    SNAPSHOT_JS = """
-        var ele = document.querySelector("%s");
-        var mychart = echarts.getInstanceByDom(ele);
-        return mychart.getDataURL({
-            type: '%s',
-            pixelRatio: %s,
-            excludeComponents: ['toolbox']
-        });
-    """
-    content1 = driver.execute_script(SNAPSHOT_JS % ('#main','png', 2))
-    content_array1 = content1.split(",")
-    if len(content_array1) != 2:
-        raise OSError(content_array1)
-    image_data1 = decode_base64(content_array1[1])
-    content2 = driver.execute_script(SNAPSHOT_JS % ('#main2','png', 2))
-    content_array2 = content2.split(",")
-    if len(content_array2) != 2:
-        raise OSError(content_array2)
-    image_data2 = decode_base64(content_array2[1])
-
-    def load_bytes_string_as_img_object(image_data: bytes) -> PngImageFile:
-        image_file = BytesIO()
-        image_file.write(image_data)
-        image_file.seek(0)
-        return Image.open(image_file)
-
-    # Merge two images
-    foreground1 = load_bytes_string_as_img_object(image_data1)
-    foreground2 = load_bytes_string_as_img_object(image_data2)
-    background = Image.new('RGBA', (foreground1.size), (255, 255, 255, 255))
-    background.paste(foreground2, (0, 0), foreground2)
-    background.paste(foreground1, (0, 0), foreground1)
-    background.save('ranking.png', 'png')
-    
-    import sys
-    driver.quit()
+    try:
+        html_path = "file://" + os.path.abspath(index_path)
+        driver.get(html_path)
+        # One round trip: waits for the charts' 'finished' event, then captures every variant
+        captured = driver.execute_async_script(CAPTURE_JS, variants, capture_selectors)
+    finally:
+        driver.quit()
+    if isinstance(captured, dict):
+        raise OSError(captured['error'])
+
+    for variant, data_urls in zip(variants, captured):
+        layers = []
+        for data_url in data_urls:
+            content_array = data_url.split(",")
+            if len(content_array) != 2:
+                raise OSError(content_array)
+            layers.append(Image.open(BytesIO(decode_base64(content_array[1]))).convert('RGBA'))
+
+        # Merge the charts onto a white background
+        background = Image.new('RGBA', layers[0].size, (255, 255, 255, 255))
+        for layer in layers:
+            background.alpha_composite(layer)
+        save_png(background, variant['name'])
     print("Rendered")
-    sys.exit(0)
 
-if __name__ == '__main__':
-    full_language_result_list = get_test_results_from_website()
-    full_language_result_list.extend(get_local_extended_results())
+# Palette and layout shared with renderlogic_template.js
+chart_colors = ['#454C6F', '#D1DDE2', '#7A97A3', '#A89882', '#484E2A', '#EDF0F4', '#C2B7A7']
+chart_width = 1080
+chart_row_height = 48
+chart_footer_margin = 72  # value axis labels (8 + 18) and the two footer lines (16 * 2 + 5) below the grid
+chart_font_names = ('Arial.ttf', 'arial.ttf', 'LiberationSans-Regular.ttf', 'DejaVuSans.ttf')
+chart_bold_font_names = ('Arial Bold.ttf', 'arialbd.ttf', 'LiberationSans-Bold.ttf', 'DejaVuSans-Bold.ttf')
+
+def load_chart_font(size: int, bold: bool = False):
+    from PIL import ImageFont
+    for name in (chart_bold_font_names if bold else chart_font_names):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed size bitmap font
+        return ImageFont.load_default()
+
+def nice_axis_ticks(maximum: float, count: int = 5) -> List[float]:
+    # Round tick interval of 1, 2 or 5 times a power of ten, like echarts' value axis
+    raw_step = max(maximum, 1e-9) / count
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(x * magnitude for x in (1, 2, 5, 10) if x * magnitude >= raw_step)
+    return [step * i for i in range(int(math.ceil(maximum / step - 1e-9)) + 1)]
+
+def ordinal_suffix(num: int) -> str:
+    # Same rule as the label formatter in renderlogic_template.js
+    return {'1': 'st', '2': 'nd', '3': 'rd'}.get(str(num)[-1], 'th')
+
+def native_render_image(output: str, render_date: str, dest_name: str = image_path, pixel_ratio: int = 2):
+    # Draw the ranking chart of docs/index.html directly with Pillow, no browser involved.
+    # Everything is positioned from the data alone, so the same input gives the same bytes.
+    from PIL import Image, ImageDraw, ImageColor
+    raw_data = json.loads(output)
+    rows = len(raw_data)
+    scale = lambda x: int(round(x * pixel_ratio))
+    rgba = lambda color, opacity=1.0: (*ImageColor.getrgb(color), int(round(opacity * 255)))
+    font = lambda size, bold=False: load_chart_font(scale(size), bold)
+
+    width, height = chart_width, max(rows * chart_row_height, 240)
+    image = Image.new('RGBA', (scale(width), scale(height)), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image, 'RGBA')
+    text = lambda xy, content, size, color, anchor='la', bold=False: draw.text(
+        (scale(xy[0]), scale(xy[1])), content, font=font(size, bold), fill=color, anchor=anchor
+    )
+
+    # Grid with room for the category labels on the left and the value labels at the bottom
+    label_font = font(15)
+    label_width = max(raw_data | Map(lambda x: draw.textlength(x[0], font=label_font)) | list) / pixel_ratio
+    left, right = width * 0.03 + label_width + 12, width * 0.96 - 10
+    # short charts keep room for the footer under the axis labels
+    top, bottom = 60, min(height * 0.97 - 40, height - chart_footer_margin)
+    band = (bottom - top) / rows
+    bar_height = band * 0.7
+    row_center = lambda i: top + band * (i + 0.5)
+
+    # Background chart: split areas and ranking bars growing from the right edge
+    rank_ticks = nice_axis_ticks(rows)
+    rank_max = rank_ticks[-1]
+    rank_x = lambda value: right - (right - left) * value / rank_max
+    for i in range(len(rank_ticks) - 1):
+        area = (210, 219, 238, 51) if i % 2 else (250, 250, 250, 51)
+        draw.rectangle([scale(rank_x(rank_ticks[i + 1])), scale(top), scale(rank_x(rank_ticks[i])), scale(bottom)], fill=area)
+    for tick in rank_ticks:
+        draw.line([scale(rank_x(tick)), scale(top), scale(rank_x(tick)), scale(bottom)], fill=rgba(chart_colors[1], 0.5), width=scale(1))
+    for i, (_, _, weighted_index) in enumerate(raw_data):
+        bar_left = rank_x(rows + 1 - weighted_index)
+        draw.rectangle(
+            [scale(bar_left), scale(row_center(i) - bar_height / 2), scale(right), scale(row_center(i) + bar_height / 2)],
+            fill=rgba(chart_colors[3], 0.8)
+        )
+        num = int(weighted_index)
+        text((right + 5, row_center(i)), f"{num}{ordinal_suffix(num)}", 14, rgba(chart_colors[4]), 'lm')
+
+    # Foreground chart: time consumption bars, axes and titles
+    secs_max = max(raw_data | Map(lambda x: x[1]) | list)
+    secs_max = round(min(secs_max * 1.08, secs_max + 10))
+    # echarts also labels the rounded maximum at the end of the axis
+    secs_ticks = nice_axis_ticks(secs_max, 7) | Filter(lambda x: x < secs_max) | list
+    secs_ticks.append(secs_max)
+    secs_x = lambda value: left + (right - left) * value / secs_max
+    for i, (name, secs, _) in enumerate(raw_data):
+        draw.rectangle(
+            [scale(left), scale(row_center(i) - bar_height / 2), scale(secs_x(secs)), scale(row_center(i) + bar_height / 2)],
+            fill=rgba(chart_colors[2], 0.8)
+        )
+        # Format like a javascript number, 1.0 shows as 1
+        text((secs_x(secs) + 5, row_center(i)), f"{int(secs) if secs == int(secs) else secs}x", 14, rgba(chart_colors[0]), 'lm')
+        text((left - 8, row_center(i)), name, 15, rgba(chart_colors[0]), 'rm')
+    draw.line([scale(left), scale(top), scale(left), scale(bottom)], fill=rgba(chart_colors[0]), width=scale(1))
+    draw.line([scale(left), scale(bottom), scale(right), scale(bottom)], fill=rgba(chart_colors[0]), width=scale(1))
+    for tick in secs_ticks:
+        text((secs_x(tick), bottom + 8), f"{tick:g}x", 15, rgba(chart_colors[0]), 'ma')
+    text((left - 8, top - 8), "Language", 12, rgba(chart_colors[0]), 'rs')
+
+    text((width / 2, 4), "The Computer Language Benchmarks Game Visualization", 23, rgba('#464646'), 'ma', bold=True)
+    text((width - 5, 28), f"Update date: {render_date}", 14, rgba(chart_colors[0], 0.5), 'ra')
+    legend_x = width * 0.23
+    for color, label in ((chart_colors[2], 'Time consumption(multiplier)'), (chart_colors[6], 'Ranking (weighted by time and memory)')):
+        # square swatches, rounded_rectangle needs Pillow 8.2 and requirements.txt pins 8.1.0
+        draw.rectangle([scale(legend_x), scale(32), scale(legend_x + 25), scale(46)], fill=rgba(color, 0.85))
+        text((legend_x + 30, 39), label, 15, rgba('#333333'), 'lm')
+        legend_x += 30 + draw.textlength(label, font=font(15)) / pixel_ratio + 10
+    for i, line in enumerate((
+        "Data source from benchmarksgame-team.pages.debian.net",
+        "Render by GoodManWEN/Programming-Language-Benchmarks-Visualization.git"
+    )):
+        text((width - 5, height - 5 - 16 * (1 - i)), line, 13, rgba(chart_colors[0], 0.5), 'rd')
+
+    # No text chunks or timestamps, so the bytes only depend on the drawing
+    save_png(image, dest_name)
+    print("Rendered")
+
+render_image_map = {
+    'native': native_render_image,        # Pillow, in process
+    'chrome': lambda *args: webkit_render_images(),  # headless Chrome screenshot of docs/index.html
+}
+
+stage_cache_dir = './.cache/stages'
+
+def content_hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        part = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        # length prefix so that ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(f'{len(part)}:'.encode('utf-8'))
+        digest.update(part)
+    return digest.hexdigest()
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return content_hash(f.read())
+
+def run_stage(name: str, inputs: List, func, outputs: List[str] = (), force: bool = False):
+    # Run `func` unless its inputs hash the same as last time and its output files are untouched,
+    # in which case the recorded result is returned. Stages downstream are keyed on this stage's
+    # result or output files, so they are skipped as well without any extra bookkeeping.
+    key = content_hash(name, *inputs)
+    record_path = os.path.join(stage_cache_dir, f'{name}.json')
+    if not force and os.path.exists(record_path):
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.loads(f.read())
+        if record['key'] == key and all(
+            os.path.exists(path) and file_hash(path) == digest for path, digest in record['outputs'].items()
+        ):
+            print(f"Stage {name}: unchanged, skipped")
+            return record['result']
+
+    result = func()
+    record = {
+        'key': key,
+        'result': result,
+        'outputs': {path: file_hash(path) for path in outputs},
+    }
+    os.makedirs(stage_cache_dir, exist_ok=True)
+    with open(f'{record_path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record))
+    os.replace(f'{record_path}.tmp', record_path)
+    return result
+
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+def rank_pages(pages: List[Tuple[str, str, List[Dict]]], phase: str = 'cold') -> str:
+    full_language_result_list = pages | Map(lambda x: x[2]) | Filter(lambda x: len(x) > 0) | list
+    local_results = get_local_extended_results(phase)
+    local_labels = local_executor_labels(local_results)
+    full_language_result_list.extend(local_results)
     
-    frame_secs = convert_into_pandas_dataframe(full_language_result_list, "secs")
-    frame_mem = convert_into_pandas_dataframe(full_language_result_list, "mem")
-    result_secs = compute_language_ordered_value(frame_secs, weight_mode=2)
-    result_mem = compute_language_ordered_value(frame_mem, weight_mode=3)
+    frames = convert_into_pandas_dataframes(full_language_result_list, ("secs", "mem"))
+    frame_secs, frame_mem = frames["secs"], frames["mem"]
+    result_secs = compute_language_ordered_value(frame_secs, weight_mode=2, local_labels=local_labels)
+    result_mem = compute_language_ordered_value(frame_mem, weight_mode=3, local_labels=local_labels)
     view = add_weighted_index(result_secs, result_mem)
-    output = render_json_output(view)
-    render(
-        "renderlogic_template.js", 
-        "./docs/renderlogic.js", 
-        raw_data=output, 
-        render_date=datetime.date.today().strftime('%Y-%m-%d')
+    return render_json_output(view)
+
+ranking_path = './.cache/ranking.json'
+
+def stage_result(name: str):
+    # Result recorded by the last run of stage `name`, None if it never ran
+    record_path = os.path.join(stage_cache_dir, f'{name}.json')
+    if not os.path.exists(record_path):
+        return None
+    with open(record_path, 'r', encoding='utf-8') as f:
+        return json.loads(f.read())['result']
+
+def command_fetch(args) -> List[Tuple[str, str, List[Dict]]]:
+    previous = load_latest_snapshot() if args.incremental else {}
+    pages = scrape_language_pages(offline=args.offline, previous=previous)
+    if args.incremental:
+        print(f"Changed since last snapshot: {changed_pages(pages, previous)}")
+    save_snapshot(pages)
+    return pages
+
+def command_rank(args, pages: List[Tuple[str, str, List[Dict]]] = None) -> str:
+    if pages is None:
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise RuntimeError("No snapshot to rank, run the fetch subcommand first.")
+        pages = load_snapshot(snapshots[-1])
+
+    def rank():
+        output = rank_pages(pages, args.phase)
+        os.makedirs(os.path.dirname(ranking_path), exist_ok=True)
+        with open(ranking_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+        return output
+    # The ranking depends on the scraped pages, our own results and the code computing it
+    return run_stage(
+        'rank',
+        [json.dumps(pages | Map(lambda x: x[:2]) | list), read_bytes(local_result_path), read_bytes(__file__), read_bytes(robust_stats_path), args.phase],
+        rank,
+        outputs=[ranking_path],
+        force=args.force
+    )
+
+def command_render_js(args, output: str = None) -> str:
+    output = output if output is not None else read_bytes(ranking_path).decode('utf-8')
+    # The render date is not part of the key, an unchanged ranking keeps its old date
+    def render_js():
+        render_date = datetime.date.today().strftime('%Y-%m-%d')
+        if args.data_file:
+            # renderlogic.js stays the same from run to run, only the data file changes
+            write_data_asset(output, render_date)
+            render(template_path, renderlogic_path, raw_data='[]', render_date='', data_url=data_url)
+        else:
+            render(template_path, renderlogic_path, raw_data=output, render_date=render_date, data_url='')
+        return render_date
+    return run_stage(
+        'render-js',
+        [output, read_bytes(template_path), read_bytes(__file__), str(args.data_file)],
+        render_js,
+        outputs=[renderlogic_path] + ([data_path] if args.data_file else []),
+        force=args.force
+    )
+
+def command_render_png(args, output: str = None, render_date: str = None):
+    output = output if output is not None else read_bytes(ranking_path).decode('utf-8')
+    render_date = render_date or stage_result('render-js') or datetime.date.today().strftime('%Y-%m-%d')
+    run_stage(
+        'render-png',
+        [args.renderer, output, render_date, read_bytes(renderlogic_path), read_bytes(index_path), read_bytes(__file__)],
+        lambda: render_image_map[args.renderer](output, render_date),
+        outputs=[image_path],
+        force=args.force
+    )
+
+def command_history(args):
+    # Speedup trend of every local executor across all dates in result.json
+    def history():
+        output = render_history_output(compute_speedup_history(load_local_samples(args.phase)))
+        with open(history_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    run_stage(
+        'history',
+        [read_bytes(local_result_path), read_bytes(__file__), read_bytes(robust_stats_path), args.phase],
+        history,
+        outputs=[history_path],
+        force=args.force
     )
-    webkit_render_images()
+
+def command_all(args):
+    pages = command_fetch(args)
+    output = command_rank(args, pages)
+    render_date = command_render_js(args, output)
+    command_render_png(args, output, render_date)
+    command_history(args)
+
+def command_startup(args):
+    # Wall time from process start until a subcommand's body would begin, i.e. interpreter, this
+    # module and the parser, measured in fresh processes. The heavy libraries are imported lazily
+    # by the stages that use them and count towards those stages, `python -X importtime
+    # update_and_render.py <subcommand>` lists them.
+    timings = {}
+    for name in ['python', *(x for x in subcommand_map if x != 'startup')]:
+        cmd = [sys.executable, '-c', 'pass'] if name == 'python' else [sys.executable, __file__, '--startup-only', name]
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run(cmd, check=True)
+            samples.append(time.perf_counter() - start)
+        timings[name] = sorted(samples)[len(samples) // 2]
+        print(f"{name:<12}{timings[name] * 1000:>10.1f} ms")
+    return timings
+
+subcommand_map = {
+    'fetch': command_fetch,
+    'rank': command_rank,
+    'history': command_history,
+    'render-js': command_render_js,
+    'render-png': command_render_png,
+    'all': command_all,
+    'startup': command_startup,
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    fetch_options = argparse.ArgumentParser(add_help=False)
+    fetch_options.add_argument('--offline', action='store_true', help="serve every page from the local http cache")
+    fetch_options.add_argument('--incremental', action='store_true', help="only re-parse pages changed since the last snapshot")
+    stage_options = argparse.ArgumentParser(add_help=False)
+    stage_options.add_argument('--force', action='store_true', help="run every stage even if its inputs are unchanged")
+    phase_options = argparse.ArgumentParser(add_help=False)
+    phase_options.add_argument('--phase', choices=sorted(local_phase_map), default='cold', help="rank our interpreters' first run or their warmed up runs")
+    js_options = argparse.ArgumentParser(add_help=False)
+    js_options.add_argument('--data-file', action='store_true', help="write the ranking to docs/ranking.json instead of inlining it")
+    png_options = argparse.ArgumentParser(add_help=False)
+    png_options.add_argument('--renderer', choices=sorted(render_image_map), default='native', help="how ranking.png is drawn")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--startup-only', action='store_true', help="exit right before the subcommand would start working")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('fetch', parents=[fetch_options], help="scrape the website into a snapshot")
+    subparsers.add_parser('rank', parents=[stage_options, phase_options], help=f"rank the latest snapshot and local results into {ranking_path}")
+    subparsers.add_parser('history', parents=[stage_options, phase_options], help=f"write the local speedup trend to {history_path}")
+    subparsers.add_parser('render-js', parents=[stage_options, js_options], help="render docs/renderlogic.js")
+    subparsers.add_parser('render-png', parents=[stage_options, png_options], help="render ranking.png")
+    subparsers.add_parser('all', parents=[fetch_options, stage_options, phase_options, js_options, png_options], help="every stage in order")
+    startup = subparsers.add_parser('startup', help="time the startup of every subcommand")
+    startup.add_argument('--repeat', type=int, default=5)
+    return parser
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    # A bare invocation, with or without options, runs the whole pipeline as it always has
+    if not (set(argv) & {*subcommand_map, '-h', '--help'}):
+        argv = ['all', *argv]
+    args = build_parser().parse_args(argv)
+    if args.startup_only:
+        sys.exit(0)
+    subcommand_map[args.command](args)